@@ -1,11 +1,27 @@
-from flask import Flask, render_template, jsonify
-from flask_socketio import SocketIO
-from transformers import pipeline
+from flask import Flask, Response, render_template, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from command_matcher import PhraseMatcher
+from inference import BatchingClassifier, BackgroundModelLoader, CLASSIFIER_BACKENDS, load_classifier, thread_budget
+from worker_pool import CommandWorkerPool
+from model_workers import ProcessClassifierPool
+from resource_usage import cpu_count
+from metrics import MetricsRegistry, LapTimer, NULL_TIMER
+from telemetry import TelemetryAggregator
+from profiler import SamplingProfiler, ProfilerBusy
+from logging_setup import configure_logging, dropped_records, COMMAND_LOGGER
+from result_cache import RoutingCache, config_fingerprint, normalize_transcript
+from speech import END_OF_AUDIO, AudioStream, Utterance, load_recognizer
+from traffic_capture import TrafficCapture
+from wake_word import WakeWordSpotter, load_templates
+import collections
+import functools
+import hmac
 import logging
 import os
+import socket
 import threading
 import time
-from functools import lru_cache
+import uuid
 
 # ===== IDENTITY CONFIGURATION =====
 IDENTITY_DETAILS = {
@@ -22,18 +38,56 @@ IDENTITY_DETAILS = {
 # Suppress warnings
 os.environ['HF_HUB_DISABLE_SYMLINKS_WARNING'] = '1'
 
+# Logging - structured records go through a background queue (see logging_setup)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # 'json' or 'text'
+LOG_COMMANDS = os.environ.get('LOG_COMMANDS', '1') != '0'  # per-command info logs
+log = logging.getLogger('care_assistant')
+command_log = logging.getLogger(COMMAND_LOGGER)
+client_log = logging.getLogger('care_assistant.client')
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'care-assistant-123'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Initialize classifier - load it once at startup
-print("Loading classification model...")
-classifier = pipeline(
-    "zero-shot-classification",
-    model="typeform/distilbert-base-uncased-mnli",
-    device=-1  # Force CPU
+# Fallback classifier backend: 'pipeline' (zero-shot NLI), 'quantized' or 'embedding'
+CLASSIFIER_BACKEND = os.environ.get('CLASSIFIER_BACKEND', 'pipeline')
+
+# Minimum score for the model to count as an identity query
+IDENTITY_CONFIDENCE_THRESHOLD = float(
+    os.environ.get('IDENTITY_CONFIDENCE_THRESHOLD', CLASSIFIER_BACKENDS[CLASSIFIER_BACKEND].threshold)
+)
+
+# Micro-batching settings for fallback classification
+CLASSIFIER_MAX_BATCH_SIZE = int(os.environ.get('CLASSIFIER_MAX_BATCH_SIZE', 8))
+CLASSIFIER_BATCH_WAIT_MS = float(os.environ.get('CLASSIFIER_BATCH_WAIT_MS', 10))
+CLASSIFIER_BATCH_BUCKETS = tuple(
+    int(b) for b in os.environ.get('CLASSIFIER_BATCH_BUCKETS', '1,2,4,8,16,32').split(',')
 )
-print("Model loaded successfully!")
+
+# CPU budget for inference - defaults are derived from the core count
+DEFAULT_INTRA_OP, DEFAULT_INTER_OP, DEFAULT_INFERENCE_CONCURRENCY = thread_budget()
+TORCH_INTRA_OP_THREADS = int(os.environ.get('TORCH_INTRA_OP_THREADS', DEFAULT_INTRA_OP))
+TORCH_INTER_OP_THREADS = int(os.environ.get('TORCH_INTER_OP_THREADS', DEFAULT_INTER_OP))
+INFERENCE_CONCURRENCY = int(os.environ.get('INFERENCE_CONCURRENCY', DEFAULT_INFERENCE_CONCURRENCY))
+
+# Optional inference worker processes, started after the model loads (0 = in-process)
+MODEL_WORKERS = int(os.environ.get('MODEL_WORKERS', 0))
+MODEL_WORKER_TIMEOUT = float(os.environ.get('MODEL_WORKER_TIMEOUT', 30))
+MODEL_WORKER_HEALTH_INTERVAL = float(os.environ.get('MODEL_WORKER_HEALTH_INTERVAL', 5))
+model_worker_pool = None
+
+# The model loads in the background (see start_model_loading); until it is
+# ready these stay None and model fallbacks get a degraded response
+classifier = None
+batched_classifier = None
+model_loader = None
+
+# Startup timing, relative to when this module started executing
+STARTUP_BEGAN = time.monotonic()
+FIRST_ROUTE_SECONDS = None  # port bound plus one in-process route, set by the startup self-probe
+SERVER_HOST = '0.0.0.0'
+SERVER_PORT = 5000
 
 # FIXED: Consistent action types and directions
 VOICE_COMMANDS = {
@@ -66,6 +120,88 @@ VOICE_COMMANDS = {
     "text too big": {"action": "adjust_text", "direction": "decrease", "feedback": "Making text smaller"}
 }
 
+# Command processing pool - bounded so bursts are rejected, not queued forever
+COMMAND_WORKERS = int(os.environ.get('COMMAND_WORKERS', min(4, os.cpu_count() or 1)))
+COMMAND_QUEUE_SIZE = int(os.environ.get('COMMAND_QUEUE_SIZE', 32))
+command_pool = CommandWorkerPool(num_workers=COMMAND_WORKERS, max_queue_size=COMMAND_QUEUE_SIZE)
+
+# Cache of routing decisions keyed on the normalized transcript
+ROUTING_CACHE_SIZE = int(os.environ.get('ROUTING_CACHE_SIZE', 1024))
+ROUTING_CACHE_TTL = float(os.environ.get('ROUTING_CACHE_TTL', 300))
+routing_cache = RoutingCache(max_size=ROUTING_CACHE_SIZE, ttl=ROUTING_CACHE_TTL)
+
+# Sessions that opted in to receive a copy of every reply (test harnesses)
+MONITOR_ROOM = 'monitor'
+MONITOR_SESSIONS = set()
+CONNECTED_SESSIONS = set()
+
+# Rolling end-to-end latency percentiles reported by the clients
+TELEMETRY_WINDOW_SECONDS = int(os.environ.get('TELEMETRY_WINDOW_SECONDS', 900))
+client_telemetry = TelemetryAggregator(window_seconds=TELEMETRY_WINDOW_SECONDS)
+
+# Server-side recognition of streamed audio ('' leaves the audio events disabled)
+SPEECH_RECOGNIZER = os.environ.get('SPEECH_RECOGNIZER', '')
+STUB_RECOGNIZER_DIR = os.environ.get('STUB_RECOGNIZER_DIR', 'simulated_commands')
+AUDIO_MAX_SECONDS = float(os.environ.get('AUDIO_MAX_SECONDS', 30))
+AUDIO_MAX_STREAMS_PER_SID = int(os.environ.get('AUDIO_MAX_STREAMS_PER_SID', 2))
+# Act on a partial transcript as soon as it holds an unambiguous command
+AUDIO_EARLY_COMMIT = os.environ.get('AUDIO_EARLY_COMMIT', '1') == '1'
+# End the utterance on trailing silence instead of waiting for audio_end
+AUDIO_VAD = os.environ.get('AUDIO_VAD', '1') == '1'
+# Wake word templates from wake_word.py ('' = streams cannot ask for a wake word)
+WAKE_WORD_TEMPLATES = os.environ.get('WAKE_WORD_TEMPLATES', '')
+WAKE_WORD_THRESHOLD = float(os.environ.get('WAKE_WORD_THRESHOLD', 0.15))
+speech_recognizer = None
+wake_templates = None
+AUDIO_STREAMS = {}  # (sid, request_id) -> Utterance being received
+# (sid, request_id) -> (committed_at, trigger) of committed utterances, until their audio_end
+AUDIO_COMMITTED = collections.OrderedDict()
+AUDIO_COMMITTED_MAX = 1024
+AUDIO_LOCK = threading.Lock()  # both dicts are changed by handlers and workers
+
+# Opt-in capture of real commands for replay_traffic.py ('' = off)
+TRAFFIC_CAPTURE_PATH = os.environ.get('TRAFFIC_CAPTURE_PATH', '')
+TRAFFIC_CAPTURE_MAX_MB = float(os.environ.get('TRAFFIC_CAPTURE_MAX_MB', 10))
+TRAFFIC_CAPTURE_BACKUPS = int(os.environ.get('TRAFFIC_CAPTURE_BACKUPS', 5))
+TRAFFIC_CAPTURE_SECRET = os.environ.get('TRAFFIC_CAPTURE_SECRET')  # stable session ids across restarts
+traffic_capture = None
+
+# Admin-only endpoints (profiling) are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 30))
+PROFILE_MAX_OVERHEAD = float(os.environ.get('PROFILE_MAX_OVERHEAD', 0.02))
+PROFILES = {}  # profile id -> {'status': ..., 'result': ...}, most recent few only
+PROFILES_KEPT = 5
+
+# ===== METRICS (served as Prometheus text on /metrics) =====
+METRICS = MetricsRegistry()
+COMMAND_SECONDS = METRICS.histogram(
+    'command_latency_seconds', 'Time from receiving a command to emitting its reply', ['route'])
+STAGE_SECONDS = METRICS.histogram(
+    'command_stage_seconds', 'Time spent in each command pipeline stage', ['stage', 'route'])
+AUDIO_COMMIT_LEAD_SECONDS = METRICS.histogram(
+    'audio_commit_lead_seconds', 'How long before audio_end a streamed command was committed', ['trigger'])
+METRICS.gauge('active_threads', 'Live Python threads', threading.active_count)
+METRICS.gauge('connected_sessions', 'Connected Socket.IO sessions', lambda: len(CONNECTED_SESSIONS))
+METRICS.gauge('command_queue_depth', 'Commands waiting for a worker',
+              lambda: command_pool.stats()['queue_depth'])
+METRICS.gauge('command_workers_busy', 'Command workers currently running a command',
+              lambda: command_pool.stats()['busy_workers'])
+METRICS.counter('commands_rejected_total', 'Commands rejected because the queue was full',
+                lambda: command_pool.stats()['rejected'])
+METRICS.counter('routing_cache_lookups_total', 'Routing cache lookups by result',
+                lambda: {('hit',): routing_cache.hits, ('miss',): routing_cache.misses}, ['result'])
+METRICS.counter('routing_cache_evictions_total', 'Routing cache entries evicted for space',
+                lambda: routing_cache.evictions)
+METRICS.gauge('model_ready', 'Whether the fallback model is loaded (1) or not (0)',
+              lambda: int(batched_classifier is not None))
+METRICS.counter('log_records_dropped_total', 'Log records dropped because the log queue was full',
+                dropped_records)
+METRICS.counter('traffic_capture_dropped_total', 'Captured commands dropped because the capture queue was full',
+                lambda: traffic_capture.dropped if traffic_capture else None)
+METRICS.gauge('classifier_pending', 'Transcripts waiting for a classifier batch',
+              lambda: batched_classifier.stats()['pending'] if batched_classifier else 0)
+
 # Original command configs for fallback
 COMMAND_CONFIG = {
     'identity': {
@@ -84,10 +220,25 @@ COMMAND_CONFIG = {
 # Simplified keywords
 IDENTITY_KEYWORDS = ['identity', 'who am', 'my name', 'emergency contact']
 FORMATTED_IDENTITY_RESPONSE = None
+COMMAND_MATCHER = None
 
 def initialize_app():
     """Precompute values needed for faster runtime performance"""
-    global FORMATTED_IDENTITY_RESPONSE
+    global FORMATTED_IDENTITY_RESPONSE, COMMAND_MATCHER
+    
+    # Compile all command phrases into a single matcher
+    COMMAND_MATCHER = PhraseMatcher(VOICE_COMMANDS)
+    
+    # Cached decisions are only valid for the configuration that made them
+    routing_cache.set_version(config_fingerprint(
+        VOICE_COMMANDS, COMMAND_CONFIG, IDENTITY_KEYWORDS, IDENTITY_DETAILS,
+        CLASSIFIER_BACKEND, IDENTITY_CONFIDENCE_THRESHOLD
+    ))
+    
+    # Client timings are kept per action only for actions the server can send
+    client_telemetry.set_actions(
+        {command['action'] for command in VOICE_COMMANDS.values()} | {COMMAND_CONFIG['identity']['action']}
+    )
     
     # Pre-format identity response
     template = COMMAND_CONFIG['identity']['responses']['default']
@@ -101,6 +252,118 @@ def initialize_app():
 # Run initialization
 initialize_app()
 
+def on_model_ready(loaded_classifier):
+    """Install the freshly loaded model and tell clients it is available"""
+    global classifier, batched_classifier
+    
+    # Concurrent fallbacks are queued and classified together
+    batched_classifier = BatchingClassifier(
+        loaded_classifier,
+        max_batch_size=CLASSIFIER_MAX_BATCH_SIZE,
+        max_wait_ms=CLASSIFIER_BATCH_WAIT_MS,
+        histogram_buckets=CLASSIFIER_BATCH_BUCKETS,
+        # With worker processes, keep every worker busy
+        max_concurrent=MODEL_WORKERS or INFERENCE_CONCURRENCY
+    )
+    classifier = loaded_classifier
+    
+    ready_seconds = time.monotonic() - STARTUP_BEGAN
+    log.info("Model loaded", extra={
+        'model_ready_seconds': round(ready_seconds, 3),
+        'first_route_seconds': FIRST_ROUTE_SECONDS
+    })
+    socketio.emit('app_ready', readiness())
+
+def start_model_workers(loaded_classifier):
+    """Start inference worker processes, each loading its own copy of the model
+    
+    The copy loaded here has already fetched the model into the local cache;
+    it is released once the workers take over.
+    """
+    global model_worker_pool
+    
+    log.info("Starting model worker processes", extra={'workers': MODEL_WORKERS})
+    model_worker_pool = ProcessClassifierPool(
+        functools.partial(load_classifier, CLASSIFIER_BACKEND),
+        threshold=loaded_classifier.threshold,
+        num_workers=MODEL_WORKERS,
+        request_timeout=MODEL_WORKER_TIMEOUT,
+        health_interval=MODEL_WORKER_HEALTH_INTERVAL,
+        intra_op_threads=max(1, cpu_count() // MODEL_WORKERS)
+    )
+    return model_worker_pool
+
+def start_model_loading():
+    """Load and warm up the classifier without blocking the server"""
+    global model_loader
+    
+    if model_loader is None:
+        log.info("Loading classification model in the background", extra={'backend': CLASSIFIER_BACKEND})
+        model_loader = BackgroundModelLoader(
+            CLASSIFIER_BACKEND,
+            warmup_labels=COMMAND_CONFIG['identity']['labels'],
+            on_ready=on_model_ready,
+            intra_op_threads=TORCH_INTRA_OP_THREADS,
+            inter_op_threads=TORCH_INTER_OP_THREADS,
+            wrap=start_model_workers if MODEL_WORKERS > 0 else None
+        ).start()
+    return model_loader
+
+def start_traffic_capture():
+    """Start writing the capture log, if enabled"""
+    global traffic_capture
+    
+    if TRAFFIC_CAPTURE_PATH and traffic_capture is None:
+        traffic_capture = TrafficCapture(
+            TRAFFIC_CAPTURE_PATH,
+            secret=TRAFFIC_CAPTURE_SECRET,
+            max_bytes=int(TRAFFIC_CAPTURE_MAX_MB * 1024 * 1024),
+            backup_count=TRAFFIC_CAPTURE_BACKUPS
+        )
+        log.info("Capturing traffic", extra={'path': TRAFFIC_CAPTURE_PATH})
+    return traffic_capture
+
+def start_speech_recognizer():
+    """Load the configured recognizer for the audio events, if any"""
+    global speech_recognizer
+    
+    if SPEECH_RECOGNIZER and speech_recognizer is None:
+        kwargs = {'directory': STUB_RECOGNIZER_DIR} if SPEECH_RECOGNIZER == 'stub' else {}
+        speech_recognizer = load_recognizer(SPEECH_RECOGNIZER, **kwargs)
+        log.info("Speech recognizer ready", extra={'recognizer': SPEECH_RECOGNIZER})
+    return speech_recognizer
+
+def start_wake_word():
+    """Load the wake word templates, if configured"""
+    global wake_templates
+    
+    if WAKE_WORD_TEMPLATES and wake_templates is None:
+        wake_templates = load_templates(WAKE_WORD_TEMPLATES)
+        log.info("Wake word templates loaded", extra={
+            'path': WAKE_WORD_TEMPLATES, 'templates': len(wake_templates)
+        })
+    return wake_templates
+
+def readiness():
+    """Model readiness as reported in app_ready"""
+    status = model_loader.status if model_loader else 'idle'
+    return {
+        'status': 'ok',
+        'model_ready': batched_classifier is not None,
+        'model_status': status
+    }
+
+def startup_report():
+    """Time to first route versus time to model ready"""
+    ready_seconds = None
+    if model_loader and model_loader.ready_at is not None:
+        ready_seconds = model_loader.ready_at - STARTUP_BEGAN
+    return {
+        'first_route_seconds': FIRST_ROUTE_SECONDS,
+        'model_ready_seconds': ready_seconds,
+        'model': model_loader.stats() if model_loader else None
+    }
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -116,11 +379,12 @@ def test_action(action, direction):
     elif action == "adjust_text":
         feedback = f"Making text {'bigger' if direction == 'increase' else 'smaller'}"
     
+    # Admin/test route: broadcasts to every client unless ?sid= targets one
     socketio.emit('action_update', {
         'action': action,
         'direction': direction,
         'feedback': feedback
-    })
+    }, to=request.args.get('sid'))
     
     return "Test sent"
 
@@ -128,79 +392,521 @@ def test_action(action, direction):
 def test_ui():
     return render_template('test.html')
 
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms and runtime gauges for Prometheus"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/telemetry')
+def telemetry():
+    """Client-measured latency percentiles per action over the rolling window"""
+    return jsonify(client_telemetry.snapshot())
+
+def is_admin_token(token):
+    """Constant-time check against ADMIN_TOKEN; always False when no token is configured"""
+    return bool(ADMIN_TOKEN) and isinstance(token, str) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def is_admin_request():
+    """Check the X-Admin-Token header (or ?token=) against ADMIN_TOKEN"""
+    return is_admin_token(request.headers.get('X-Admin-Token') or request.args.get('token') or '')
+
+@app.route('/admin/profile')
+def admin_profile():
+    """Start sampling the command and inference threads for ?seconds=N (admin only)
+
+    Profiling runs as a background task, so this returns at once with the
+    URL to fetch the result from once the session is over.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'forbidden'}), 403
+    
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), PROFILE_MAX_SECONDS)
+        interval = float(request.args.get('interval_ms', 5)) / 1000.0
+    except ValueError:
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    
+    if any(job['status'] == 'running' for job in PROFILES.values()):
+        return jsonify({'error': "a profiling session is already running"}), 409
+    
+    profile_id = uuid.uuid4().hex[:12]
+    PROFILES[profile_id] = {'status': 'running', 'seconds': seconds, 'result': None}
+    while len(PROFILES) > PROFILES_KEPT:
+        del PROFILES[next(iter(PROFILES))]
+    
+    profiler = SamplingProfiler(interval=max(interval, 0.001), max_overhead=PROFILE_MAX_OVERHEAD,
+                                sleep=socketio.sleep)
+    log.info("Profiling started", extra={'seconds': seconds, 'profile_id': profile_id})
+    socketio.start_background_task(run_profile, profiler, profile_id, seconds)
+    return jsonify({
+        'profile_id': profile_id,
+        'status': 'running',
+        'seconds': seconds,
+        'result_url': f"/admin/profile/{profile_id}"
+    }), 202
+
+def run_profile(profiler, profile_id, seconds):
+    job = PROFILES.get(profile_id, {})
+    try:
+        job['result'] = profiler.profile(seconds)
+        job['status'] = 'done'
+    except ProfilerBusy as e:
+        job['status'], job['error'] = 'failed', str(e)
+    except Exception:
+        log.exception("Profiling failed", extra={'profile_id': profile_id})
+        job['status'], job['error'] = 'failed', "profiling failed"
+
+@app.route('/admin/profile/<profile_id>')
+def admin_profile_result(profile_id):
+    """A profiling session's result: collapsed stacks plus the hottest functions
+
+    Returns 202 while it is still running, and just the collapsed stacks
+    as text with ?format=collapsed.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'forbidden'}), 403
+    
+    job = PROFILES.get(profile_id)
+    if job is None:
+        return jsonify({'error': 'unknown profile'}), 404
+    if job['status'] == 'running':
+        return jsonify({'profile_id': profile_id, 'status': 'running'}), 202
+    if job['status'] == 'failed':
+        return jsonify({'profile_id': profile_id, 'status': 'failed', 'error': job['error']}), 500
+    
+    result = job['result']
+    if request.args.get('format') == 'collapsed':
+        return Response(result['collapsed'] + '\n', mimetype='text/plain')
+    return jsonify(result)
+
+@app.route('/stats')
+def stats():
+    """Runtime counters for the command pool and classifier batching"""
+    return jsonify({
+        'command_pool': command_pool.stats(),
+        'classifier_batching': batched_classifier.stats() if batched_classifier else None,
+        'routing_cache': routing_cache.stats(),
+        'model_workers': model_worker_pool.stats() if model_worker_pool else None,
+        'startup': startup_report()
+    })
+
 @socketio.on('process_command')
 def handle_command(data):
-    print(f"\n🔍 Processing command: {data['text']}")
-    # Process in a separate thread to avoid blocking
-    threading.Thread(target=process_command_thread, args=(data,)).start()
+    if not isinstance(data, dict):
+        emit('error', {'message': "command needs an object payload"})
+        return
+    # Hand off to the worker pool; reject immediately if it is saturated
+    if not command_pool.submit(process_command_thread, data, request.sid, time.perf_counter()):
+        command_log.warning("Command queue full, rejecting command", extra={
+            'sid': request.sid, 'request_id': data.get('request_id')
+        })
+        busy = {'message': "I'm a little busy, please try again"}
+        if data.get('request_id') is not None:
+            busy['request_id'] = data['request_id']
+        emit('busy', busy)
 
-def process_command_thread(data):
-    try:
-        transcript = data['text'].lower().strip()
-        print(f"📝 Command text: {transcript}")
-        
-        # SIMPLIFIED APPROACH: Direct command matching
-        # Check each command to see if it appears in the transcript
-        for command, action in VOICE_COMMANDS.items():
-            if command in transcript:
-                print(f"✅ Matched command: {command}")
-                print(f"✅ Sending action: {action}")
-                socketio.emit('action_update', action)
-                return
-                
-        # Special handling for common phrases
-        if "bright" in transcript:
-            print("✅ Detected brightness command")
-            if "too" in transcript or "very" in transcript:
-                socketio.emit('action_update', {
-                    'action': 'adjust_contrast',
-                    'direction': 'dark',
-                    'feedback': 'Switching to dark mode'
-                })
+def send_reply(event, payload, sid, request_id=None, route=None):
+    """Send a reply to the session that issued the command (and any monitors)"""
+    # Copy so shared VOICE_COMMANDS entries are never mutated
+    extra = {key: value for key, value in (('request_id', request_id), ('route', route)) if value is not None}
+    if extra:
+        payload = dict(payload, **extra)
+    socketio.emit(event, payload, to=sid)
+    if MONITOR_SESSIONS:
+        socketio.emit(event, payload, to=MONITOR_ROOM, skip_sid=sid)
+
+def probe_first_route(port, command='dark mode', timeout=60):
+    """Record how soon after startup the server is listening and can route a command
+    
+    Runs beside the server: waits until the port accepts TCP connections,
+    then routes a fast-path command in-process. No Socket.IO round trip is
+    made, so handshake and emit costs are not included. Independent of
+    when real clients arrive.
+    """
+    global FIRST_ROUTE_SECONDS
+    
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                break
+        except OSError:
+            if time.monotonic() > deadline:
+                log.warning("Startup probe gave up waiting for the server", extra={'port': port})
                 return
-                
-        # Check for identity queries
-        if any(keyword in transcript for keyword in IDENTITY_KEYWORDS):
-            print("🆔 Identity query detected")
-            socketio.emit('action_update', {
-                'action': 'show_identity',
-                'feedback': FORMATTED_IDENTITY_RESPONSE
-            })
-            return
+            socketio.sleep(0.05)
+    
+    route_command(normalize_transcript(command))
+    FIRST_ROUTE_SECONDS = time.monotonic() - STARTUP_BEGAN
+    log.info("Server listening and routing commands", extra={
+        'first_route_seconds': round(FIRST_ROUTE_SECONDS, 3),
+        'model_ready': batched_classifier is not None
+    })
+
+def route_command(transcript, model=None, threshold=None, timer=NULL_TIMER):
+    """Decide how to answer a transcript
+
+    Returns (route, event, payload) where route names the path that
+    produced the answer. Each check is charged to `timer` as a stage.
+    """
+    model = model or batched_classifier
+    threshold = IDENTITY_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    
+    # Direct command matching - longest whole-word phrase wins
+    match = COMMAND_MATCHER.match(transcript)
+    timer.lap('phrase_match')
+    if match:
+        command, action = match
+        command_log.debug("Matched command phrase", extra={'phrase': command})
+        return 'fast_match', 'action_update', action
+            
+    # Special handling for common phrases
+    too_bright = "bright" in transcript and ("too" in transcript or "very" in transcript)
+    timer.lap('bright_check')
+    if too_bright:
+        return 'bright_heuristic', 'action_update', {
+            'action': 'adjust_contrast',
+            'direction': 'dark',
+            'feedback': 'Switching to dark mode'
+        }
             
-        # If no direct match, use the model as fallback
-        print("🤖 No direct match, trying AI classification")
-        # Only use identity labels for classification now
-        identity_labels = COMMAND_CONFIG['identity']['labels']
+    # Check for identity queries
+    is_identity = any(keyword in transcript for keyword in IDENTITY_KEYWORDS)
+    timer.lap('keyword_check')
+    if is_identity:
+        return 'identity_keyword', 'action_update', {
+            'action': 'show_identity',
+            'feedback': FORMATTED_IDENTITY_RESPONSE
+        }
         
-        result = classifier(transcript, identity_labels)
-        top_label = result['labels'][0]
-        confidence = result['scores'][0]
+    # The model is still loading - answer with a defined degraded response
+    if model is None:
+        return 'model_loading', 'error', {
+            'message': "I'm still getting ready, please try again in a moment",
+            'degraded': True
+        }
+    
+    # If no direct match, use the model as fallback
+    # Only use identity labels for classification now
+    identity_labels = COMMAND_CONFIG['identity']['labels']
+    
+    result = model(transcript, identity_labels)
+    timer.lap('model')
+    top_label = result['labels'][0]
+    confidence = result['scores'][0]
+    command_log.debug("Model classification", extra={'label': top_label, 'confidence': confidence})
+    
+    if confidence >= threshold and top_label in identity_labels:
+        return 'model', 'action_update', {
+            'action': 'show_identity',
+            'feedback': FORMATTED_IDENTITY_RESPONSE
+        }
+    
+    return 'unrecognized', 'error', {'message': "Let me clarify that"}
+
+def process_command_thread(data, sid, enqueued_at=None, timer=None):
+    request_id = data.get('request_id')
+    timer = timer or LapTimer(start=enqueued_at)
+    timer.lap('queue')
+    route = 'error'
+    outcome = 'error'
+    try:
+        transcript = normalize_transcript(data['text'])
         
-        if confidence >= 0.35 and top_label in identity_labels:
-            print("🆔 AI detected identity query")
-            socketio.emit('action_update', {
-                'action': 'show_identity',
-                'feedback': FORMATTED_IDENTITY_RESPONSE
-            })
+        # Repeated phrases reuse the earlier decision instead of re-running the model
+        decision = routing_cache.get(transcript)
+        timer.lap('cache')
+        if decision is None:
+            decision = route_command(transcript, timer=timer)
+            # Degraded answers must not outlive the model load
+            if decision[0] != 'model_loading':
+                routing_cache.put(transcript, decision)
+            route = decision[0]
         else:
-            print("❓ Command not recognized")
-            socketio.emit('error', {'message': "Let me clarify that"})
+            route = 'cache_hit'
+        
+        _, event, payload = decision
+        outcome = payload.get('action', event)
+        send_reply(event, payload, sid, request_id, route)
+        timer.lap('emit')
             
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        socketio.emit('error', {'message': "Let's try that again"})
+    except Exception:
+        command_log.exception("Command failed", extra={'sid': sid, 'request_id': request_id})
+        route = outcome = 'error'
+        send_reply('error', {'message': "Let's try that again"}, sid, request_id, route)
+        timer.lap('emit')
+    
+    finally:
+        record_timings(route, timer)
+        if traffic_capture is not None:
+            traffic_capture.record(sid, data.get('text'), route, outcome, timer.started, timer.total())
+        # Skip building the record when per-command logs are off
+        if command_log.isEnabledFor(logging.INFO):
+            command_log.info("Command handled", extra={
+                'sid': sid,
+                'request_id': request_id,
+                'route': route,
+                'total_ms': round(timer.total() * 1000, 3),
+                'stages_ms': {stage: round(sec * 1000, 3) for stage, sec in timer.stages.items()}
+            })
+
+def process_audio_thread(utterance, sid, request_id, enqueued_at=None):
+    """Finish recognizing an utterance, then handle it like a text command"""
+    stream = utterance.stream
+    timer = LapTimer(start=enqueued_at)
+    timer.lap('queue')
+    try:
+        transcript = utterance.transcript()
+    except Exception:
+        command_log.exception("Speech recognition failed", extra={'sid': sid, 'request_id': request_id})
+        transcript = ''
+    timer.lap('recognize')
+    
+    if not transcript.strip():
+        send_reply('error', {'message': "I didn't catch that"}, sid, request_id, 'no_speech')
+        timer.lap('emit')
+        record_timings('no_speech', timer)
+        return
+    
+    command_log.debug("Audio transcribed", extra={
+        'sid': sid, 'request_id': request_id, 'audio_seconds': round(stream.duration(), 3)
+    })
+    process_command_thread({'text': transcript, 'request_id': request_id}, sid, timer=timer)
+
+def record_timings(route, timer):
+    """Feed one command's stage timings into the latency histograms"""
+    for stage, seconds in timer.stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, route=route)
+    COMMAND_SECONDS.observe(timer.total(), route=route)
 
 @socketio.on('connection_init')
 def handle_init():
     """Send initial settings to client"""
-    socketio.emit('app_ready', {'status': 'ok'})
+    emit('app_ready', readiness())
+
+@socketio.on('subscribe_monitor')
+def handle_subscribe_monitor(data=None):
+    """Opt in to receiving every session's replies (test harnesses, admin only)
+
+    Replies include identity details, so the admin token is required.
+    """
+    token = data.get('token') if isinstance(data, dict) else None
+    if not is_admin_token(token):
+        log.warning("Rejected monitor subscription", extra={'sid': request.sid})
+        emit('error', {'message': "Monitoring requires the admin token"})
+        return
+    join_room(MONITOR_ROOM)
+    MONITOR_SESSIONS.add(request.sid)
+
+@socketio.on('connect')
+def handle_connect():
+    CONNECTED_SESSIONS.add(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    CONNECTED_SESSIONS.discard(request.sid)
+    with AUDIO_LOCK:
+        for streams in (AUDIO_STREAMS, AUDIO_COMMITTED):
+            for key in [key for key in streams if key[0] == request.sid]:
+                del streams[key]
+    if request.sid in MONITOR_SESSIONS:
+        MONITOR_SESSIONS.discard(request.sid)
+        leave_room(MONITOR_ROOM)
+
+@socketio.on('audio_start')
+def handle_audio_start(data):
+    """Begin receiving one utterance as raw PCM chunks"""
+    if not isinstance(data, dict):
+        emit('error', {'message': "audio_start needs an object payload", 'request_id': None})
+        return
+    request_id = data.get('request_id')
+    if speech_recognizer is None:
+        emit('error', {'message': "Audio input is not enabled", 'request_id': request_id})
+        return
+    try:
+        stream = AudioStream(
+            data.get('sample_rate', 16000),
+            data.get('sample_width', 2),
+            data.get('channels', 1),
+            max_seconds=AUDIO_MAX_SECONDS
+        )
+    except ValueError as e:
+        emit('error', {'message': f"Unsupported audio format: {e}", 'request_id': request_id})
+        return
+    with AUDIO_LOCK:
+        open_streams = sum(1 for sid, rid in AUDIO_STREAMS if sid == request.sid and rid != request_id)
+    if open_streams >= AUDIO_MAX_STREAMS_PER_SID:
+        emit('error', {'message': "Too many audio streams open", 'request_id': request_id})
+        return
+    
+    # Continuous listening: only audio after the wake word reaches the recognizer
+    gate = None
+    if data.get('wake_word'):
+        if wake_templates is None or stream.sample_width != 2 or stream.channels != 1:
+            emit('error', {'message': "Wake word listening is not available", 'request_id': request_id})
+            return
+        gate = WakeWordSpotter(wake_templates, stream.sample_rate, threshold=WAKE_WORD_THRESHOLD)
+    with AUDIO_LOCK:
+        AUDIO_STREAMS[(request.sid, request_id)] = Utterance(speech_recognizer, stream, vad=AUDIO_VAD, gate=gate)
+
+@socketio.on('audio_chunk')
+def handle_audio_chunk(data):
+    """Queue a chunk for its utterance; recognition runs on the worker pool"""
+    if not isinstance(data, dict):
+        return
+    key = (request.sid, data.get('request_id'))
+    with AUDIO_LOCK:
+        utterance = AUDIO_STREAMS.get(key)
+    chunk = data.get('data', b'')
+    if utterance is None or not isinstance(chunk, (bytes, bytearray)):
+        return
+    if utterance.pending_bytes + len(chunk) > utterance.stream.max_bytes:
+        # The workers are a whole utterance behind this stream
+        drop_audio(key)
+        command_log.warning("Audio stream backlog too long, dropping it", extra={
+            'sid': request.sid, 'request_id': key[1]
+        })
+        emit('error', {'message': "That was too long, please try again", 'request_id': key[1]})
+        return
+    if utterance.enqueue(bytes(chunk)):
+        start_audio_drain(utterance, key)
+
+@socketio.on('audio_end')
+def handle_audio_end(data):
+    """The client stopped sending - commit the utterance unless that already happened"""
+    if not isinstance(data, dict):
+        return
+    key = (request.sid, data.get('request_id'))
+    now = time.perf_counter()
+    with AUDIO_LOCK:
+        utterance = AUDIO_STREAMS.get(key)
+        committed = AUDIO_COMMITTED.pop(key, None)
+    if committed is not None:
+        committed_at, trigger = committed
+        AUDIO_COMMIT_LEAD_SECONDS.observe(now - committed_at, trigger=trigger)
+    elif utterance is not None and utterance.end(now):
+        start_audio_drain(utterance, key)
+
+def drop_audio(key):
+    with AUDIO_LOCK:
+        AUDIO_STREAMS.pop(key, None)
+        AUDIO_COMMITTED.pop(key, None)
+
+def start_audio_drain(utterance, key):
+    """Have a worker feed an utterance its queued chunks"""
+    sid, request_id = key
+    if command_pool.submit(process_audio_chunks, utterance, key):
+        return
+    drop_audio(key)
+    command_log.warning("Command queue full, rejecting audio", extra={
+        'sid': sid, 'request_id': request_id
+    })
+    emit('busy', {'message': "I'm a little busy, please try again", 'request_id': request_id})
+
+def process_audio_chunks(utterance, key):
+    """Feed queued chunks to an utterance in order; commit early on a settled command or end of speech
+    
+    Runs on the worker pool, at most one drain per utterance, so voice
+    activity detection and recognition never hold up the event loop.
+    """
+    sid, request_id = key
+    while True:
+        chunk = utterance.next_chunk()
+        if chunk is None:
+            return
+        if chunk is END_OF_AUDIO:
+            end_audio(utterance, key)
+            continue
+        if utterance.committed:
+            continue
+        was_awake = utterance.awake
+        try:
+            partial = utterance.feed(chunk)
+        except OverflowError:
+            drop_audio(key)
+            command_log.warning("Audio stream too long, dropping it", extra={
+                'sid': sid, 'request_id': request_id
+            })
+            socketio.emit('error', {'message': "That was too long, please try again", 'request_id': request_id},
+                          to=sid)
+            return
+        except Exception:
+            drop_audio(key)
+            command_log.exception("Speech recognition failed", extra={'sid': sid, 'request_id': request_id})
+            socketio.emit('error', {'message': "Let's try that again", 'request_id': request_id}, to=sid)
+            return
+        
+        if not was_awake and utterance.awake:
+            command_log.debug("Wake word heard", extra={
+                'sid': sid, 'request_id': request_id, 'distance': round(utterance.gate.best_distance, 3)
+            })
+            socketio.emit('wake_word', {'request_id': request_id}, to=sid)
+        if partial:
+            socketio.emit('partial_transcript', {'request_id': request_id, 'text': partial}, to=sid)
+            if AUDIO_EARLY_COMMIT and COMMAND_MATCHER.match_settled(normalize_transcript(partial)):
+                commit_audio(utterance, 'partial', key)
+                continue
+        if utterance.endpointed():
+            commit_audio(utterance, 'endpoint', key)
+
+def end_audio(utterance, key):
+    """audio_end reached the drain: record the commit lead, or commit now"""
+    with AUDIO_LOCK:
+        AUDIO_STREAMS.pop(key, None)
+        committed = AUDIO_COMMITTED.pop(key, None)
+    if committed is not None:
+        committed_at, trigger = committed
+        AUDIO_COMMIT_LEAD_SECONDS.observe(utterance.ended_at - committed_at, trigger=trigger)
+    elif not utterance.committed and utterance.awake:
+        # Listening that ended without the wake word has nothing to recognize or answer
+        commit_audio(utterance, 'audio_end', key, utterance.ended_at)
+        AUDIO_COMMIT_LEAD_SECONDS.observe(0.0, trigger='audio_end')
+
+def commit_audio(utterance, trigger, key, now=None):
+    """Act on an utterance from its drain; later chunks for it are ignored
+    
+    The utterance leaves AUDIO_STREAMS here. Only its commit time and
+    trigger are kept, for the lead-time histogram at audio_end.
+    """
+    sid, request_id = key
+    now = now or time.perf_counter()
+    utterance.commit(trigger, now)
+    with AUDIO_LOCK:
+        AUDIO_STREAMS.pop(key, None)
+        if trigger != 'audio_end':
+            AUDIO_COMMITTED[key] = (now, trigger)
+            while len(AUDIO_COMMITTED) > AUDIO_COMMITTED_MAX:
+                AUDIO_COMMITTED.popitem(last=False)
+    command_log.debug("Audio committed", extra={
+        'sid': sid, 'request_id': request_id, 'trigger': trigger,
+        'audio_seconds': round(utterance.stream.duration(), 3)
+    })
+    if trigger == 'partial':
+        # The partial already names the command, so skip the final recognition pass
+        process_command_thread({'text': utterance.partial, 'request_id': request_id}, sid, now)
+    else:
+        process_audio_thread(utterance, sid, request_id, now)
+
+@socketio.on('client_telemetry')
+def handle_client_telemetry(data):
+    """Batched client timing events, folded into rolling aggregates"""
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        return {'accepted': 0, 'error': "events must be a list"}
+    return {'accepted': client_telemetry.ingest(events)}
 
 @socketio.on('client_log')
 def handle_client_log(data):
     """Log messages from client"""
-    print(f"📱 CLIENT: {data['message']}")
+    client_log.info(data.get('message', ''), extra={'sid': request.sid})
 
 if __name__ == '__main__':
-    print("🚀 Server starting...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    configure_logging(LOG_LEVEL, LOG_FORMAT, command_logs=LOG_COMMANDS)
+    log.info("Server starting")
+    # Serve the fast paths immediately; the model joins when it is ready
+    start_model_loading()
+    start_speech_recognizer()
+    start_wake_word()
+    start_traffic_capture()
+    socketio.start_background_task(probe_first_route, SERVER_PORT)
+    socketio.run(app, debug=True, host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
@@ -1,19 +1,26 @@
-import pyaudio
+import argparse
 import wave
 import time
 import os
-import json
+from speech import transcript_from_filename
+from results_store import ResultsWriter
 from test_framework import VoiceAssistantTester
+from tts_corpus import load_manifest
 
 class AudioTester:
     """Class for end-to-end audio testing of voice assistant"""
     
-    def __init__(self, audio_directory="simulated_commands"):
+    def __init__(self, audio_directory="simulated_commands", base_url="http://localhost:5000", store=None,
+                 admin_token=None):
         self.audio_directory = audio_directory
-        self.tester = VoiceAssistantTester()
+        self.admin_token = admin_token
+        self.tester = VoiceAssistantTester(base_url, store=store)
+        self.early_commits = []  # (command, seconds of audio not yet sent when answered)
         
     def play_audio_file(self, filename):
         """Play an audio file through the system speakers"""
+        import pyaudio
+        
         # Open the audio file
         wf = wave.open(filename, 'rb')
         
@@ -41,65 +48,132 @@ class AudioTester:
         # Close PyAudio
         p.terminate()
     
+    def audio_cases(self, expected_responses):
+        """(path, command, expected response) for every WAV with a known command"""
+        # Corpora from tts_corpus.py carry the expected response in their manifest
+        manifest = load_manifest(self.audio_directory)
+        if manifest is not None:
+            for item in manifest:
+                yield os.path.join(self.audio_directory, item['file']), item['command'], item
+            return
+        
+        # Find all audio files
+        audio_files = [f for f in os.listdir(self.audio_directory) if f.endswith('.wav')]
+        audio_files.sort()  # Sort to maintain order
+        
+        for audio_file in audio_files:
+            # Format is: command_001_command_text.wav
+            command = transcript_from_filename(audio_file)
+            
+            # Look up expected response
+            expected = next((er for er in expected_responses if er['command'] == command), None)
+            
+            if not expected:
+                print(f"No expected response found for command: {command}")
+                continue
+            
+            yield os.path.join(self.audio_directory, audio_file), command, expected
+    
+    def stream_audio_file(self, filename, request_id, chunk_ms=100, pacing=1.0, on_chunk=None, wake_word=False):
+        """Send a WAV's PCM to the server in chunks, paced like a live microphone
+        
+        `pacing` is the speed relative to real time: 1.0 sends each chunk
+        when it would have been captured, 2.0 twice as fast, 0 as fast as
+        possible. `on_chunk` is called after each chunk is sent; streaming
+        stops early if it returns False. With `wake_word` the server only
+        recognizes audio after it hears the wake word. Returns (seconds
+        sent, file seconds).
+        """
+        socket = self.tester.socket
+        with wave.open(filename, 'rb') as wf:
+            frames_per_chunk = max(1, int(wf.getframerate() * chunk_ms / 1000))
+            socket.emit('audio_start', {
+                'request_id': request_id,
+                'sample_rate': wf.getframerate(),
+                'sample_width': wf.getsampwidth(),
+                'channels': wf.getnchannels(),
+                'wake_word': wake_word
+            })
+            
+            total_seconds = wf.getnframes() / wf.getframerate()
+            started = time.perf_counter()
+            sent_seconds = 0.0
+            data = wf.readframes(frames_per_chunk)
+            while data:
+                if pacing > 0:
+                    # Sleep until this chunk would have finished recording
+                    delay = started + sent_seconds / pacing - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                socket.emit('audio_chunk', {'request_id': request_id, 'data': data})
+                sent_seconds += len(data) / (wf.getsampwidth() * wf.getnchannels() * wf.getframerate())
+                if on_chunk is not None and on_chunk() is False:
+                    break
+                data = wf.readframes(frames_per_chunk)
+        return sent_seconds, total_seconds
+    
+    def run_headless_tests(self, expected_responses, chunk_ms=100, pacing=1.0, wait_time=5, wake_word=False):
+        """Stream each WAV straight to the server's recognizer - no speakers or browser
+        
+        Latency runs from the last audio chunk sent to the reply, which is
+        what the server adds after the user stops speaking. When the server
+        commits on a partial transcript or end of speech, the reply can
+        arrive before the file has been sent; streaming then stops, as a
+        client would, and the unsent audio is recorded in early_commits.
+        """
+        if not self.tester.connect():
+            print("Failed to connect to server!")
+            return []
+        
+        try:
+            for path, command, expected in self.audio_cases(expected_responses):
+                print(f"Streaming audio file: {os.path.basename(path)}")
+                pending = self.tester.register(command, expected['action'], expected['direction'])
+                
+                def chunk_sent(pending=pending):
+                    if pending.completed.is_set():
+                        return False
+                    pending.start_time = time.perf_counter()
+                
+                sent, total = self.stream_audio_file(path, pending.request_id, chunk_ms, pacing,
+                                                     chunk_sent, wake_word)
+                if pending.completed.is_set():
+                    self.early_commits.append((command, total - sent))
+                self.tester.socket.emit('audio_end', {'request_id': pending.request_id})
+                self.tester.wait_for(pending, wait_time)
+            
+            results = self.tester.results
+        
+        finally:
+            self.tester.disconnect()
+        
+        return results
+    
     def run_audio_tests(self, expected_responses, wait_time=5):
         """Run audio tests by playing files and waiting for responses"""
         if not self.tester.connect():
             print("Failed to connect to server!")
             return []
         
+        # Commands come from the browser tab, so ask for a copy of its replies
+        if not self.admin_token:
+            print("Playing audio needs --admin-token (or ADMIN_TOKEN) to see the browser's replies")
+        self.tester.socket.emit('subscribe_monitor', {'token': self.admin_token})
+        
         results = []
         
         try:
-            # Find all audio files
-            audio_files = [f for f in os.listdir(self.audio_directory) if f.endswith('.wav')]
-            audio_files.sort()  # Sort to maintain order
-            
-            for audio_file in audio_files:
-                print(f"Testing audio file: {audio_file}")
+            for full_path, command, expected in self.audio_cases(expected_responses):
+                print(f"Testing audio file: {os.path.basename(full_path)}")
                 
-                # Extract command name from filename
-                # Format is: command_001_command_text.wav
-                parts = audio_file.split('_', 2)[2].rsplit('.', 1)[0]
-                command = parts.replace('_', ' ')
-                
-                # Look up expected response
-                expected = next((er for er in expected_responses if er['command'] == command), None)
-                
-                if not expected:
-                    print(f"No expected response found for command: {command}")
-                    continue
-                
-                # Set up test
-                self.tester.test_completed.clear()
-                self.tester.current_test_command = command
-                self.tester.current_test_expected = {
-                    'action': expected['action'],
-                    'direction': expected['direction']
-                }
-                self.tester.current_test_start_time = time.time()
+                # Expect the reply to the command the browser will send
+                pending = self.tester.expect_response(command, expected['action'], expected['direction'])
                 
                 # Play the audio file
-                full_path = os.path.join(self.audio_directory, audio_file)
                 self.play_audio_file(full_path)
                 
                 # Wait for response with timeout
-                success = self.tester.test_completed.wait(wait_time)
-                
-                if not success:
-                    # Timeout occurred
-                    result = {
-                        'command': command,
-                        'expected_action': expected['action'],
-                        'expected_direction': expected['direction'],
-                        'actual_action': 'timeout',
-                        'actual_direction': None,
-                        'latency': wait_time,
-                        'success': False,
-                        'error_message': 'Request timed out',
-                        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    self.tester.results.append(result)
-                    print(f"Test timeout for command: {command}")
+                self.tester.wait_for(pending, wait_time)
                 
                 # Wait between tests
                 time.sleep(2)
@@ -111,32 +185,58 @@ class AudioTester:
         
         return results
 
+def print_early_commits(early_commits, total):
+    """How often the reply beat the end of the audio, and by how much"""
+    print(f"\nAnswered before the audio ended: {len(early_commits)} of {total}")
+    if early_commits:
+        saved = sorted(seconds for _, seconds in early_commits)
+        print(f"  Audio left unsent: median {saved[len(saved) // 2] * 1000:.0f} ms, "
+              f"max {saved[-1] * 1000:.0f} ms")
+
 def main():
-    # Create audio tester
-    tester = AudioTester()
+    parser = argparse.ArgumentParser(description="End-to-end tests driven by recorded commands")
+    parser.add_argument('--url', default="http://localhost:5000")
+    parser.add_argument('--audio-dir', default="simulated_commands")
+    parser.add_argument('--headless', action='store_true',
+                        help="Stream PCM to the server recognizer instead of playing through speakers")
+    parser.add_argument('--chunk-ms', type=float, default=100, help="Headless: audio per chunk")
+    parser.add_argument('--pacing', type=float, default=1.0,
+                        help="Headless: speed relative to real time (0 = as fast as possible)")
+    parser.add_argument('--wait', type=float, default=5, help="Seconds to wait for each reply")
+    parser.add_argument('--wake-word', action='store_true',
+                        help="Headless: ask the server to wait for the wake word (use a --wake-word corpus)")
+    parser.add_argument('--store', default='results_store', help="Cross-run results store directory")
+    parser.add_argument('--admin-token', default=os.environ.get('ADMIN_TOKEN'),
+                        help="Server ADMIN_TOKEN, needed to see the browser's replies when playing audio")
+    args = parser.parse_args()
+    
+    # Create audio tester; results are also appended to the cross-run store
+    store = ResultsWriter('audio_test', args.store, metadata={
+        'headless': args.headless,
+        'audio_dir': args.audio_dir,
+        'chunk_ms': args.chunk_ms if args.headless else None,
+        'pacing': args.pacing if args.headless else None,
+        'wake_word': args.wake_word if args.headless else None
+    })
+    tester = AudioTester(args.audio_dir, args.url, store, args.admin_token)
     
     # Load expected responses from test cases
     from run_tests import TEST_CASES
     
-    # Run audio tests
-    results = tester.run_audio_tests(TEST_CASES)
-    
-    # Save results
-    with open('audio_test_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    # Run audio tests; the store holds every result, so there is no separate results file
+    try:
+        if args.headless:
+            results = tester.run_headless_tests(TEST_CASES, args.chunk_ms, args.pacing, args.wait, args.wake_word)
+        else:
+            results = tester.run_audio_tests(TEST_CASES, args.wait)
+    finally:
+        store.close()
     
     # Analyze results
-    success_count = sum(1 for r in results if r.get('success', False))
-    total_count = len(results)
-    success_rate = (success_count / total_count) * 100 if total_count > 0 else 0
-    
-    avg_latency = sum(r.get('latency', 0) for r in results) / len(results) if results else 0
-    
     print("\n===== AUDIO TEST RESULTS =====")
-    print(f"Total Tests: {total_count}")
-    print(f"Successful Tests: {success_count}")
-    print(f"Success Rate: {success_rate:.2f}%")
-    print(f"Average Latency: {avg_latency:.3f}s")
+    tester.tester.print_analysis()
+    if args.headless:
+        print_early_commits(tester.early_commits, len(results))
 
 if __name__ == "__main__":
     main()
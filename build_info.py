@@ -0,0 +1,10 @@
+import subprocess
+
+
+def git_revision():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
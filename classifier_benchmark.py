@@ -0,0 +1,112 @@
+import time
+import json
+import argparse
+from inference import CLASSIFIER_BACKENDS, load_classifier
+from result_cache import normalize_transcript
+
+
+def expected_matches(test_case, event, payload):
+    """Check a routing decision against a run_tests.py test case"""
+    if test_case['action'] == 'error':
+        return event == 'error'
+    return (event == 'action_update' and
+            payload.get('action') == test_case['action'] and
+            payload.get('direction') == test_case['direction'])
+
+
+def evaluate_backend(name, test_cases, repeats=5):
+    """Measure routing accuracy and raw model latency for one backend"""
+    import app
+
+    print(f"Loading {name} backend...")
+    load_start = time.perf_counter()
+    backend = load_classifier(name)
+    load_time = time.perf_counter() - load_start
+
+    labels = app.COMMAND_CONFIG['identity']['labels']
+    if hasattr(backend, 'label_matrix'):
+        backend.label_matrix(labels)
+
+    # Warm up so the first call does not skew latency
+    backend("hello", labels)
+
+    correct = 0
+    model_correct = 0
+    model_cases = 0
+    decisions = []
+    # The server normalizes every transcript before routing it
+    transcripts = [normalize_transcript(test_case['command']) for test_case in test_cases]
+    for test_case, transcript in zip(test_cases, transcripts):
+        route, event, payload = app.route_command(
+            transcript, model=backend, threshold=backend.threshold
+        )
+        ok = expected_matches(test_case, event, payload)
+        correct += ok
+        if route in ('model', 'unrecognized'):
+            model_cases += 1
+            model_correct += ok
+        decisions.append({
+            'command': test_case['command'],
+            'route': route,
+            'action': payload.get('action', event),
+            'correct': ok
+        })
+
+    latencies = []
+    for _ in range(repeats):
+        for transcript in transcripts:
+            start = time.perf_counter()
+            backend(transcript, labels)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    return {
+        'backend': name,
+        'load_time_s': load_time,
+        'accuracy': correct / len(test_cases) * 100,
+        'fallback_cases': model_cases,
+        'fallback_accuracy': model_correct / model_cases * 100 if model_cases else 0,
+        'mean_latency_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_latency_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_latency_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'decisions': decisions
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fallback classifier backends")
+    parser.add_argument('--backends', nargs='+', default=list(CLASSIFIER_BACKENDS),
+                        choices=list(CLASSIFIER_BACKENDS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default='classifier_benchmark_results.json')
+    args = parser.parse_args()
+
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+    test_cases = TEST_CASES + NEGATIVE_TEST_CASES
+
+    results = [evaluate_backend(name, test_cases, args.repeats) for name in args.backends]
+
+    print("\n===== CLASSIFIER BACKEND COMPARISON =====")
+    for r in results:
+        print(f"Backend: {r['backend']}")
+        print(f"  Load time: {r['load_time_s']:.2f}s")
+        print(f"  Routing accuracy: {r['accuracy']:.2f}%")
+        print(f"  Fallback accuracy: {r['fallback_accuracy']:.2f}% ({r['fallback_cases']} cases)")
+        print(f"  Model latency: mean {r['mean_latency_ms']:.1f}ms, "
+              f"p50 {r['p50_latency_ms']:.1f}ms, p99 {r['p99_latency_ms']:.1f}ms")
+
+    # Show where the backends disagree
+    if len(results) > 1:
+        print("\n=== Decisions that differ between backends ===")
+        for i, test_case in enumerate(test_cases):
+            actions = {r['backend']: r['decisions'][i]['action'] for r in results}
+            if len(set(actions.values())) > 1:
+                print(f"  {test_case['command']!r}: {actions}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import re
+
+# Words are runs of letters/digits, keeping inner apostrophes ("can't")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower().replace("\u2019", "'"))
+
+
+class PhraseMatcher:
+    """Token trie for matching many command phrases in one pass
+
+    Phrases are matched on whole words only. Lookup cost depends on the
+    transcript length and the longest phrase, not on how many phrases are
+    registered, so the vocabulary can grow without slowing the fast path.
+
+    When several phrases match, the one with the most words wins, then the
+    one with the most characters, then the one that appears first in the
+    transcript, and finally the one that was added first.
+    """
+
+    _END = object()
+
+    def __init__(self, phrases=None):
+        self._root = {}
+        self._count = 0
+        self.max_depth = 0
+        if phrases:
+            for phrase, value in phrases.items():
+                self.add(phrase, value)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, phrase, value):
+        """Register a phrase; re-adding a phrase replaces its value"""
+        tokens = tokenize(phrase)
+        if not tokens:
+            raise ValueError(f"Phrase has no words: {phrase!r}")
+
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+
+        if self._END in node:
+            # Keep the original priority so replacement stays deterministic
+            priority = node[self._END][1]
+        else:
+            priority = self._count
+            self._count += 1
+
+        node[self._END] = (phrase, priority, len(tokens), len(phrase), value)
+        self.max_depth = max(self.max_depth, len(tokens))
+
+    def match(self, text):
+        """Return (phrase, value) for the best match, or None"""
+        tokens = tokenize(text)
+        best = None
+        best_rank = None
+        for start in range(len(tokens)):
+            node = self._root
+            for token in tokens[start:start + self.max_depth]:
+                node = node.get(token)
+                if node is None:
+                    break
+                entry = node.get(self._END)
+                if entry is None:
+                    continue
+                phrase, priority, n_tokens, n_chars, value = entry
+                rank = (-n_tokens, -n_chars, start, priority)
+                if best_rank is None or rank < best_rank:
+                    best_rank = rank
+                    best = (phrase, value)
+        return best
+
+    def match_settled(self, text):
+        """Like match(), but only if more words could not change the value
+
+        For partial transcripts: returns None while the trailing words are
+        the start of some longer phrase that maps to a different value, so
+        the match is safe to act on before the speaker has finished.
+        """
+        best = self.match(text)
+        if best is None:
+            return None
+        tokens = tokenize(text)
+        for start in range(max(0, len(tokens) - self.max_depth), len(tokens)):
+            node = self._root
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+            else:
+                # The trailing words are a path into the trie; check what lies below
+                if self._has_other_value(node, best[1]):
+                    return None
+        return best
+
+    def _has_other_value(self, node, value):
+        stack = [child for key, child in node.items() if key is not self._END]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is self._END:
+                    if child[4] != value:
+                        return True
+                else:
+                    stack.append(child)
+        return False
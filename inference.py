@@ -0,0 +1,366 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from resource_usage import cpu_count
+
+log = logging.getLogger(__name__)
+
+ZERO_SHOT_MODEL = "typeform/distilbert-base-uncased-mnli"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def thread_budget(cores=None):
+    """Default (intra_op, inter_op, concurrent inferences) for this machine
+
+    Roughly one concurrent inference per four cores, with the cores split
+    evenly between them, so simultaneous inferences never oversubscribe the
+    CPU. Inter-op parallelism is of little use for a single small model.
+    """
+    cores = cores or cpu_count()
+    concurrency = max(1, cores // 4)
+    intra_op = max(1, cores // concurrency)
+    return intra_op, 1, concurrency
+
+
+def configure_torch_threads(intra_op=None, inter_op=None):
+    """Apply torch thread counts; returns the values in effect"""
+    import torch
+
+    if intra_op:
+        torch.set_num_threads(int(intra_op))
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(int(inter_op))
+        except RuntimeError:
+            # Can only be set once, before any inter-op work has started
+            log.warning("Inter-op threads already fixed for this process")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+class PipelineClassifier:
+    """Zero-shot NLI pipeline - one forward pass per candidate label"""
+
+    threshold = 0.35
+
+    def __init__(self, model_name=ZERO_SHOT_MODEL):
+        from transformers import pipeline
+
+        self.model_name = model_name
+        self.pipe = pipeline(
+            "zero-shot-classification",
+            model=model_name,
+            device=-1  # Force CPU
+        )
+
+    def __call__(self, sequences, candidate_labels, **kwargs):
+        return self.pipe(sequences, candidate_labels, **kwargs)
+
+
+class QuantizedPipelineClassifier(PipelineClassifier):
+    """Zero-shot pipeline with int8 dynamic quantization of Linear layers
+
+    Weights of every nn.Linear are stored as int8 and activations are
+    quantized on the fly, which cuts CPU latency and memory for the
+    DistilBERT model while keeping its decisions close to fp32.
+    """
+
+    def __init__(self, model_name=ZERO_SHOT_MODEL):
+        import torch
+
+        super().__init__(model_name)
+        self.pipe.model = torch.quantization.quantize_dynamic(
+            self.pipe.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.pipe.model.eval()
+
+
+class EmbeddingClassifier:
+    """Sentence-embedding classifier with cached label vectors
+
+    Labels are encoded once and kept as a normalized matrix, so each
+    utterance costs a single forward pass plus one matrix product no matter
+    how many labels there are. Scores are cosine similarities, so the
+    threshold is on a different scale from the NLI pipeline's.
+    """
+
+    threshold = 0.5
+
+    def __init__(self, model_name=EMBEDDING_MODEL, labels=None, tokenizer=None, model=None):
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        self.model_name = model_name
+        self._torch = torch
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_name)
+        self.model = model or AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self._label_cache = {}
+        self._label_lock = threading.Lock()
+
+        if labels:
+            self.label_matrix(labels)
+
+    def encode(self, texts):
+        """Mean-pooled, L2-normalized embeddings for a list of texts"""
+        torch = self._torch
+        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, dim=1)
+
+    def label_matrix(self, labels):
+        """Return the cached embedding matrix for a label set"""
+        key = tuple(labels)
+        matrix = self._label_cache.get(key)
+        if matrix is None:
+            with self._label_lock:
+                matrix = self._label_cache.get(key)
+                if matrix is None:
+                    matrix = self.encode(list(key))
+                    self._label_cache[key] = matrix
+        return matrix
+
+    def __call__(self, sequences, candidate_labels, **kwargs):
+        single = isinstance(sequences, str)
+        if single:
+            sequences = [sequences]
+
+        labels = list(candidate_labels)
+        scores = self.encode(sequences) @ self.label_matrix(labels).T
+        ranked_scores, ranked_idx = scores.sort(dim=1, descending=True)
+
+        results = []
+        for sequence, row_scores, row_idx in zip(sequences, ranked_scores.tolist(), ranked_idx.tolist()):
+            results.append({
+                'sequence': sequence,
+                'labels': [labels[i] for i in row_idx],
+                'scores': row_scores
+            })
+        return results[0] if single else results
+
+
+CLASSIFIER_BACKENDS = {
+    'pipeline': PipelineClassifier,
+    'quantized': QuantizedPipelineClassifier,
+    'embedding': EmbeddingClassifier
+}
+
+
+def load_classifier(backend='pipeline', **kwargs):
+    """Build the named classifier backend"""
+    if backend not in CLASSIFIER_BACKENDS:
+        raise ValueError(
+            f"Unknown classifier backend {backend!r}; "
+            f"choose from {', '.join(CLASSIFIER_BACKENDS)}"
+        )
+    return CLASSIFIER_BACKENDS[backend](**kwargs)
+
+
+class BackgroundModelLoader:
+    """Loads and warms up a classifier backend on a background thread
+
+    The server can accept connections straight away; callers check `ready`
+    (or `wait()`) before sending work to the model.
+    """
+
+    def __init__(self, backend='pipeline', warmup_labels=None, on_ready=None,
+                 intra_op_threads=None, inter_op_threads=None, wrap=None, **kwargs):
+        self.backend = backend
+        self.warmup_labels = warmup_labels
+        self.on_ready = on_ready
+        self.wrap = wrap
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.kwargs = kwargs
+
+        self.classifier = None
+        self.status = 'idle'
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        if self._thread is None:
+            self.status = 'loading'
+            self.started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._load, name='model-loader', daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the model is ready; returns False on timeout or failure"""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def _load(self):
+        try:
+            if self.intra_op_threads or self.inter_op_threads:
+                intra, inter = configure_torch_threads(self.intra_op_threads, self.inter_op_threads)
+                log.info("Torch threads configured", extra={'intra_op': intra, 'inter_op': inter})
+
+            load_start = time.monotonic()
+            classifier = load_classifier(self.backend, **self.kwargs)
+            self.load_seconds = time.monotonic() - load_start
+
+            # e.g. start worker processes before any inference has run
+            if self.wrap:
+                classifier = self.wrap(classifier)
+
+            # One throwaway inference so the first real request is not slow
+            if self.warmup_labels:
+                warmup_start = time.monotonic()
+                classifier("warm up", list(self.warmup_labels))
+                self.warmup_seconds = time.monotonic() - warmup_start
+
+            self.classifier = classifier
+            self.status = 'ready'
+            self.ready_at = time.monotonic()
+            if self.on_ready:
+                self.on_ready(classifier)
+            self._ready.set()
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+            log.exception("Model failed to load", extra={'backend': self.backend})
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'status': self.status,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds
+        }
+
+
+class _PendingRequest:
+    """A single transcript waiting to be classified"""
+
+    def __init__(self, sequence, labels):
+        self.sequence = sequence
+        self.labels = labels
+        self.future = Future()
+
+
+class BatchingClassifier:
+    """Micro-batching front end for a zero-shot classification pipeline
+
+    Callers block as if they called the pipeline directly. Behind the scenes
+    a scheduler thread collects requests for up to `max_wait_ms` (or until
+    `max_batch_size` are waiting) and runs them as one batched pipeline
+    call, so concurrent fallbacks share forward passes instead of competing
+    for the same cores. `max_concurrent` scheduler threads run, which caps
+    how many inferences execute at once.
+    """
+
+    def __init__(self, classifier, max_batch_size=8, max_wait_ms=10,
+                 histogram_buckets=(1, 2, 4, 8, 16, 32), max_concurrent=1):
+        self.classifier = classifier
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.histogram_buckets = sorted(histogram_buckets)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._histogram = {bound: 0 for bound in self.histogram_buckets}
+        self._histogram['+Inf'] = 0
+        self._batches = 0
+        self._requests = 0
+
+        self._threads = []
+        for i in range(self.max_concurrent):
+            thread = threading.Thread(target=self._run, name=f'classifier-batcher-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def threshold(self):
+        return self.classifier.threshold
+
+    def __call__(self, sequence, candidate_labels, timeout=None):
+        """Classify one sequence, waiting for the batch it lands in"""
+        request = _PendingRequest(sequence, tuple(candidate_labels))
+        self._queue.put(request)
+        return request.future.result(timeout)
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            self._record_batch(len(batch))
+
+            # Only requests with the same candidate labels can share a call
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.labels, []).append(request)
+
+            for labels, requests in groups.items():
+                self._classify_group(labels, requests)
+
+    def _classify_group(self, labels, requests):
+        sequences = [r.sequence for r in requests]
+        try:
+            results = self.classifier(
+                sequences,
+                list(labels),
+                batch_size=len(sequences) * len(labels)
+            )
+            # The pipeline returns a bare dict for single inputs
+            if isinstance(results, dict):
+                results = [results]
+            for request, result in zip(requests, results):
+                request.future.set_result(result)
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+
+    def _record_batch(self, size):
+        with self._lock:
+            self._batches += 1
+            self._requests += size
+            for bound in self.histogram_buckets:
+                if size <= bound:
+                    self._histogram[bound] += 1
+                    break
+            else:
+                self._histogram['+Inf'] += 1
+
+    def stats(self):
+        """Return batch counters and the batch-size histogram"""
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'batches': self._batches,
+                'requests': self._requests,
+                'mean_batch_size': self._requests / self._batches if self._batches else 0,
+                'pending': self._queue.qsize(),
+                'batch_size_histogram': dict(self._histogram)
+            }
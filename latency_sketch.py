@@ -0,0 +1,248 @@
+import math
+import threading
+import time
+
+# Log-linear buckets: each bucket is ~2% wide, which bounds the relative
+# error of any reported percentile to about 1% regardless of sample count.
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MIN_VALUE = 1e-6  # 1 microsecond, in seconds
+REPORT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencySketch:
+    """Fixed-accuracy streaming quantile sketch (DDSketch/HDR style)
+
+    Values are counted in logarithmically spaced buckets, so memory grows
+    with the range of values seen, not with how many were recorded.
+    Sketches with the same accuracy can be merged exactly, which makes
+    them safe to combine across threads, time windows or processes.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_value=DEFAULT_MIN_VALUE):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _bucket_value(self, index):
+        # Midpoint of the bucket, which bounds the relative error
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value, count=1):
+        """Record a value (negative values are treated as zero)"""
+        value = max(0.0, value)
+        if value < self.min_value:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Value at quantile q (0..1), or None if empty"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Never report outside the observed range
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def merge(self, other):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.relative_accuracy != self.relative_accuracy or other.min_value != self.min_value:
+            raise ValueError("can only merge sketches with the same accuracy settings")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """Count, mean, min/max and the requested quantiles"""
+        result = {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min,
+            'max': self.max
+        }
+        for q in quantiles:
+            result[f'p{q * 100:g}'] = self.quantile(q)
+        return result
+
+    def to_dict(self):
+        """JSON-serializable snapshot, restorable with from_dict()"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['min_value'])
+        sketch.buckets = {int(index): count for index, count in data['buckets'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.total = data['total']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
+
+
+class LatencyBreakdown:
+    """Streaming success counts and latency sketches, overall and per key
+
+    Results are folded in as they arrive and only the sketches are kept,
+    so memory stays flat however long a run is. Snapshots from separate
+    runs or load-generator processes can be merged into one report.
+    """
+
+    def __init__(self):
+        self.overall = LatencySketch()
+        self.groups = {}
+        self.successes = 0
+        self._lock = threading.Lock()
+
+    def _group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {'successes': 0, 'sketch': LatencySketch()}
+        return group
+
+    def add(self, key, latency, success=True):
+        with self._lock:
+            group = self._group(key)
+            group['sketch'].add(latency)
+            self.overall.add(latency)
+            if success:
+                group['successes'] += 1
+                self.successes += 1
+
+    def merge(self, other):
+        with self._lock:
+            self.overall.merge(other.overall)
+            self.successes += other.successes
+            for key, theirs in other.groups.items():
+                group = self._group(key)
+                group['sketch'].merge(theirs['sketch'])
+                group['successes'] += theirs['successes']
+        return self
+
+    @staticmethod
+    def _describe(successes, sketch, quantiles):
+        return {
+            'total': sketch.count,
+            'successful': successes,
+            'success_rate': successes / sketch.count * 100 if sketch.count else 0,
+            'latency': sketch.summary(quantiles)
+        }
+
+    def summary(self, quantiles=REPORT_QUANTILES):
+        """Totals and latency percentiles overall and for each key"""
+        with self._lock:
+            result = self._describe(self.successes, self.overall, quantiles)
+            result['groups'] = {
+                key: self._describe(group['successes'], group['sketch'], quantiles)
+                for key, group in sorted(self.groups.items(), key=lambda item: str(item[0]))
+            }
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'overall': self.overall.to_dict(),
+                'successes': self.successes,
+                'groups': {
+                    key: {'successes': group['successes'], 'sketch': group['sketch'].to_dict()}
+                    for key, group in self.groups.items()
+                }
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        breakdown = cls()
+        breakdown.overall = LatencySketch.from_dict(data['overall'])
+        breakdown.successes = data['successes']
+        breakdown.groups = {
+            key: {'successes': group['successes'], 'sketch': LatencySketch.from_dict(group['sketch'])}
+            for key, group in data['groups'].items()
+        }
+        return breakdown
+
+
+class RollingLatencyAggregator:
+    """Per-key latency sketches over a sliding time window
+
+    Time is split into `bucket_seconds` slots; each slot keeps one sketch
+    per key. Queries merge the slots still inside the window, and old
+    slots are dropped as time moves on, so memory stays bounded without
+    storing raw events.
+    """
+
+    def __init__(self, window_seconds=900, bucket_seconds=60, clock=time.time):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now_slot):
+        oldest = now_slot - int(self.window_seconds // self.bucket_seconds)
+        for slot in [s for s in self._slots if s <= oldest]:
+            del self._slots[slot]
+
+    def add(self, key, value):
+        now_slot = int(self.clock() // self.bucket_seconds)
+        with self._lock:
+            self._expire(now_slot)
+            sketches = self._slots.setdefault(now_slot, {})
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = LatencySketch()
+            sketch.add(value)
+
+    def snapshot(self, quantiles=(0.5, 0.9, 0.99)):
+        """Merged summaries per key for the current window"""
+        now_slot = int(self.clock() // self.bucket_seconds)
+        merged = {}
+        with self._lock:
+            self._expire(now_slot)
+            for sketches in self._slots.values():
+                for key, sketch in sketches.items():
+                    merged.setdefault(key, LatencySketch()).merge(sketch)
+        return {key: sketch.summary(quantiles) for key, sketch in merged.items()}
@@ -1,205 +1,387 @@
-from json.tool import main
+import argparse
+import asyncio
+import itertools
+import json
+import random
 import time
-import threading
+import uuid
 import socketio
-import random
-import json
-import matplotlib.pyplot as plt
-import numpy as np
-from concurrent.futures import ThreadPoolExecutor
+from latency_sketch import LatencyBreakdown
+from results_store import ResultsWriter
+
+REPLY_EVENTS = ('action_update', 'error', 'busy')
+
+
+class VirtualTablet:
+    """One simulated tablet: a single Socket.IO connection
+
+    Handlers are registered once per connection and replies are matched to
+    requests by request id, so a tablet can have several commands in
+    flight at the same time.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self._pending = {}
+
+        for event in REPLY_EVENTS:
+            self.sio.on(event, self._reply_handler(event))
+
+    def _reply_handler(self, event):
+        async def handler(data):
+            future = self._pending.pop(data.get('request_id'), None)
+            if future is not None and not future.done():
+                future.set_result((event, data, time.perf_counter()))
+        return handler
+
+    async def connect(self):
+        await self.sio.connect(self.base_url, transports=['websocket'])
+
+    async def disconnect(self):
+        try:
+            await self.sio.disconnect()
+        except Exception:
+            pass
+
+    async def send(self, command, timeout):
+        """Send a command and wait for its reply: (event, data, received_at)"""
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self.sio.emit('process_command', {'text': command, 'request_id': request_id})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
 
 class LoadTester:
-    """Class for load testing the voice assistant"""
-    
-    def __init__(self, base_url="http://localhost:5000"):
+    """Load generator simulating many tablets on one asyncio event loop
+
+    Open-loop mode issues commands at a fixed arrival rate no matter how
+    fast the server answers; closed-loop mode has each tablet wait for its
+    reply (plus think time) before sending the next command. In both
+    modes latency is measured from when a command was *meant* to be sent,
+    so time a request spent waiting behind a slow generator or server is
+    not silently dropped (coordinated omission).
+    """
+
+    def __init__(self, base_url="http://localhost:5000", timeout=10, connect_concurrency=100,
+                 keep_results=False, store=None):
         self.base_url = base_url
+        self.timeout = timeout
+        self.connect_concurrency = connect_concurrency
+        # Only sketches are kept by default, so memory stays flat on long runs
+        self.keep_results = keep_results
+        # Optional results_store.ResultsWriter; rows go to disk, not memory
+        self.store = store
         self.results = []
-        self.active_clients = 0
-        self.max_active_clients = 0
-        self.lock = threading.Lock()
-        
-    def client_session(self, commands, delay=0):
-        """Simulate a client session with multiple commands"""
-        # Create socket client
-        sio = socketio.Client()
-        client_results = []
-        
+        self.by_route = LatencyBreakdown()
+        self.by_action = LatencyBreakdown()
+        self.total_commands = 0
+        self.max_send_lag = 0.0
+        self.connected_clients = 0
+        self.mode = None
+
+    async def _connect_all(self, num_clients):
+        """Open connections, a bounded number at a time"""
+        semaphore = asyncio.Semaphore(self.connect_concurrency)
+        tablets = [VirtualTablet(self.base_url) for _ in range(num_clients)]
+
+        async def connect(tablet):
+            async with semaphore:
+                try:
+                    await tablet.connect()
+                    return tablet
+                except Exception as e:
+                    print(f"Client connection error: {e}")
+                    return None
+
+        connected = await asyncio.gather(*(connect(t) for t in tablets))
+        return [t for t in connected if t is not None]
+
+    async def _request(self, tablet, test_case, intended_at):
+        """Send one command and record its latency from `intended_at`"""
+        sent_at = time.perf_counter()
+        self.max_send_lag = max(self.max_send_lag, sent_at - intended_at)
+        command = test_case['command']
+        result = {
+            'command': command,
+            'expected_action': test_case['action'],
+            'timestamp': time.time(),
+            'route': None,
+            'event': None,
+            'actual_action': None,
+            'latency': None,
+            'send_lag': sent_at - intended_at,
+            'success': False,
+            'error': None
+        }
         try:
-            # Connect to server
-            sio.connect(self.base_url)
-            
-            # Update active client count
-            with self.lock:
-                self.active_clients += 1
-                self.max_active_clients = max(self.max_active_clients, self.active_clients)
-            
-            # Initial delay to stagger clients
-            if delay > 0:
-                time.sleep(delay)
-            
-            # Process each command
-            for command in commands:
-                result = {
-                    'command': command,
-                    'timestamp': time.time(),
-                    'start_time': time.time(),
-                    'end_time': None,
-                    'latency': None,
-                    'success': False,
-                    'error': None
-                }
-                
-                # Event to track completion
-                completed = threading.Event()
-                
-                # Set up response handlers
-                @sio.on('action_update')
-                def on_action_update(data):
-                    end_time = time.time()
-                    result['end_time'] = end_time
-                    result['latency'] = end_time - result['start_time']
-                    result['success'] = True
-                    result['response'] = data
-                    completed.set()
-                
-                @sio.on('error')
-                def on_error(data):
-                    end_time = time.time()
-                    result['end_time'] = end_time
-                    result['latency'] = end_time - result['start_time']
-                    result['success'] = False
-                    result['error'] = data.get('message', 'Unknown error')
-                    completed.set()
-                
-                # Send the command
-                sio.emit('process_command', {'text': command})
-                
-                # Wait for response with timeout
-                if completed.wait(10):  # 10 second timeout
-                    client_results.append(result)
-                else:
-                    # Timeout
-                    result['end_time'] = time.time()
-                    result['latency'] = result['end_time'] - result['start_time']
-                    result['success'] = False
-                    result['error'] = 'Timeout'
-                    client_results.append(result)
-                
-                # Wait between commands
-                time.sleep(1)
-            
-            # Save results
-            with self.lock:
-                self.results.extend(client_results)
-            
+            event, data, received_at = await tablet.send(command, self.timeout)
+            result['event'] = event
+            result['actual_action'] = data.get('action', event)
+            result['route'] = data.get('route', event)
+            result['latency'] = received_at - intended_at
+            if test_case['action'] == 'error':
+                result['success'] = event == 'error'
+            else:
+                result['success'] = (event == 'action_update' and
+                                     data.get('action') == test_case['action'] and
+                                     data.get('direction') == test_case['direction'])
+            if event != 'action_update':
+                result['error'] = data.get('message', 'Unknown error')
+        except asyncio.TimeoutError:
+            result['route'] = 'timeout'
+            result['latency'] = time.perf_counter() - intended_at
+            result['error'] = 'Timeout'
         except Exception as e:
-            print(f"Client error: {e}")
-        finally:
-            # Update active client count
-            with self.lock:
-                self.active_clients -= 1
-            
-            # Disconnect
-            try:
-                sio.disconnect()
-            except:
-                pass
-    
-    def run_load_test(self, num_clients, commands_per_client, command_pool):
-        """Run a load test with multiple clients"""
-        # Reset results
+            result['route'] = 'client_error'
+            result['latency'] = time.perf_counter() - intended_at
+            result['error'] = str(e)
+
+        self.total_commands += 1
+        self.by_route.add(result['route'], result['latency'], result['success'])
+        self.by_action.add(test_case['action'], result['latency'], result['success'])
+        if self.store is not None:
+            self.store.append(result)
+        if self.keep_results:
+            self.results.append(result)
+
+    async def _open_loop(self, tablets, test_cases, rate, duration, arrival):
+        """Issue commands at `rate` per second for `duration` seconds"""
+        # Finished requests drop out so memory does not grow with run length
+        in_flight = set()
+        clients = itertools.cycle(tablets)
+        start = time.perf_counter()
+        intended_at = start
+        while intended_at < start + duration:
+            delay = intended_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Fire and forget: a slow reply never delays the next arrival
+            task = asyncio.create_task(
+                self._request(next(clients), random.choice(test_cases), intended_at)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            gap = random.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+            intended_at += gap
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def _closed_loop(self, tablets, test_cases, requests_per_client, think_time):
+        """Each tablet sends its next command once the previous one is answered"""
+        async def session(tablet, offset):
+            # Stagger the first command so tablets do not fire in lockstep
+            intended_at = time.perf_counter() + offset
+            for _ in range(requests_per_client):
+                delay = intended_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._request(tablet, random.choice(test_cases), intended_at)
+                intended_at = max(intended_at, time.perf_counter()) + think_time
+
+        await asyncio.gather(*(
+            session(tablet, random.uniform(0, think_time)) for tablet in tablets
+        ))
+
+    async def run(self, num_clients, test_cases, mode='open', rate=10.0, duration=30.0,
+                  arrival='constant', requests_per_client=10, think_time=1.0):
+        """Connect `num_clients` tablets, drive load and return the analysis"""
+        self.mode = mode
         self.results = []
-        self.active_clients = 0
-        self.max_active_clients = 0
-        
-        # Prepare client commands
-        client_commands = []
-        for i in range(num_clients):
-            # Choose random commands from the pool
-            commands = random.choices(command_pool, k=commands_per_client)
-            client_commands.append(commands)
-        
-        # Start client threads
-        start_time = time.time()
-        with ThreadPoolExecutor(max_workers=num_clients) as executor:
-            for i, commands in enumerate(client_commands):
-                # Stagger client starts
-                delay = i * 0.5  # 500ms between client starts
-                executor.submit(self.client_session, commands, delay)
-        
-        # Wait for all clients to complete
-        total_time = time.time() - start_time
-        
-        # Analyze results
-        return self.analyze_results(total_time, num_clients)
-    
+        self.by_route = LatencyBreakdown()
+        self.by_action = LatencyBreakdown()
+        self.total_commands = 0
+        self.max_send_lag = 0.0
+
+        tablets = await self._connect_all(num_clients)
+        self.connected_clients = len(tablets)
+        if not tablets:
+            print("No clients could connect")
+            return self.analyze_results(0.0, num_clients)
+
+        try:
+            start = time.perf_counter()
+            if mode == 'open':
+                await self._open_loop(tablets, test_cases, rate, duration, arrival)
+            else:
+                await self._closed_loop(tablets, test_cases, requests_per_client, think_time)
+            total_time = time.perf_counter() - start
+        finally:
+            await asyncio.gather(*(t.disconnect() for t in tablets))
+
+        analysis = self.analyze_results(total_time, num_clients)
+        if mode == 'open':
+            analysis['offered_rate'] = rate
+            analysis['arrival'] = arrival
+        else:
+            analysis['think_time'] = think_time
+        return analysis
+
+    def run_load_test(self, num_clients, test_cases, **kwargs):
+        """Blocking wrapper around run()"""
+        return asyncio.run(self.run(num_clients, test_cases, **kwargs))
+
     def analyze_results(self, total_time, num_clients):
-        """Analyze load test results"""
-        if not self.results:
-            return {
-                'total_commands': 0,
-                'success_rate': 0,
-                'average_latency': 0,
-                'throughput': 0,
-                'max_concurrent': 0
-            }
-        
-        total_commands = len(self.results)
-        successful = sum(1 for r in self.results if r['success'])
-        success_rate = (successful / total_commands) * 100
-        
-        latencies = [r['latency'] for r in self.results if r['latency'] is not None]
-        avg_latency = sum(latencies) / len(latencies) if latencies else 0
-        
-        throughput = total_commands / total_time if total_time > 0 else 0
-        
-        analysis = {
-            'total_commands': total_commands,
-            'successful_commands': successful,
-            'success_rate': success_rate,
-            'average_latency': avg_latency,
-            'throughput': throughput,
-            'max_concurrent': self.max_active_clients,
+        """Throughput and latency percentiles, overall, per route and per expected action"""
+        return analyze_snapshot(self.snapshot(total_time, num_clients))
+
+    def snapshot(self, total_time, num_clients):
+        """Mergeable record of a run; combine several with merge_snapshots()"""
+        return {
+            'mode': self.mode,
+            'clients': num_clients,
+            'connected_clients': self.connected_clients,
+            'total_commands': self.total_commands,
             'total_time': total_time,
-            'clients': num_clients
+            'max_send_lag': self.max_send_lag,
+            'by_route': self.by_route.to_dict(),
+            'by_action': self.by_action.to_dict()
         }
-        
-        return analysis
-    
-    def visualize_load_test(self, analyses, output_file='load_test_results.png'):
-        """Visualize load test results"""
-        # Extract data
-        clients = [a['clients'] for a in analyses if 'clients' in a]
-
-    def main():
-        from run_tests import TEST_CASES
-        command_pool = [tc['command'] for tc in TEST_CASES]
-    
-    # Create load tester
-        tester = LoadTester()
-    
-    # Run tests with different client counts
-        results = []
-        for clients in [1, 2, 5]:  # Start with smaller numbers first
-         print(f"Running load test with {clients} simultaneous clients...")
-         analysis = tester.run_load_test(
-            num_clients=clients,
-            commands_per_client=3,
-            command_pool=command_pool
+
+
+def merge_snapshots(snapshots):
+    """Combine runs from several load-generator processes running side by side"""
+    by_route = LatencyBreakdown()
+    by_action = LatencyBreakdown()
+    for snap in snapshots:
+        by_route.merge(LatencyBreakdown.from_dict(snap['by_route']))
+        by_action.merge(LatencyBreakdown.from_dict(snap['by_action']))
+    return {
+        'mode': snapshots[0]['mode'],
+        'clients': sum(s['clients'] for s in snapshots),
+        'connected_clients': sum(s['connected_clients'] for s in snapshots),
+        'total_commands': sum(s['total_commands'] for s in snapshots),
+        # The processes ran concurrently, so the wall time is the longest one
+        'total_time': max(s['total_time'] for s in snapshots),
+        'max_send_lag': max(s['max_send_lag'] for s in snapshots),
+        'by_route': by_route.to_dict(),
+        'by_action': by_action.to_dict()
+    }
+
+
+def analyze_snapshot(snap):
+    by_route = LatencyBreakdown.from_dict(snap['by_route']).summary()
+    by_action = LatencyBreakdown.from_dict(snap['by_action']).summary()
+    total_commands = snap['total_commands']
+    total_time = snap['total_time']
+    return {
+        'mode': snap['mode'],
+        'clients': snap['clients'],
+        'connected_clients': snap['connected_clients'],
+        'total_commands': total_commands,
+        'successful_commands': by_route['successful'],
+        'success_rate': by_route['success_rate'],
+        'total_time': total_time,
+        'throughput': total_commands / total_time if total_time > 0 else 0,
+        # If this approaches the latencies, the generator itself is the bottleneck
+        'max_send_lag': snap['max_send_lag'],
+        'latency': by_route['latency'],
+        'routes': {route: group['latency'] for route, group in by_route['groups'].items()},
+        'actions': {
+            action: dict(group['latency'], success_rate=group['success_rate'])
+            for action, group in by_action['groups'].items()
+        }
+    }
+
+
+def print_analysis(analysis):
+    print(f"Clients: {analysis['connected_clients']}/{analysis['clients']} connected, mode: {analysis['mode']}")
+    print(f"  Commands: {analysis['total_commands']} in {analysis['total_time']:.1f}s "
+          f"({analysis['throughput']:.1f}/s), success rate {analysis['success_rate']:.2f}%")
+    print(f"  Max send lag: {analysis['max_send_lag'] * 1000:.1f} ms")
+    print(f"  {'Route':<18} {'Count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    _print_rows([('all', analysis['latency'])] + list(analysis['routes'].items()))
+    print(f"  {'Expected action':<18} {'Count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+          f"{'p99.9 ms':>9} {'max ms':>9} {'success':>8}")
+    _print_rows(analysis['actions'].items(), extended=True)
+
+
+def _print_rows(rows, extended=False):
+    for name, s in rows:
+        if not s['count']:
+            continue
+        line = (f"  {str(name):<18} {s['count']:>7} {s['p50'] * 1000:>9.1f} {s['p90'] * 1000:>9.1f} "
+                f"{s['p99'] * 1000:>9.1f}")
+        if extended:
+            line += f" {s['p99.9'] * 1000:>9.1f} {s['max'] * 1000:>9.1f} {s['success_rate']:>7.1f}%"
+        else:
+            line += f" {s['max'] * 1000:>9.1f}"
+        print(line)
+
+
+def main():
+    from run_tests import TEST_CASES
+
+    parser = argparse.ArgumentParser(description="Drive the server with many simulated tablets")
+    parser.add_argument('--url', default="http://localhost:5000")
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 1000],
+                        help="Number of tablets; several values run one test each")
+    parser.add_argument('--mode', choices=('open', 'closed'), default='open')
+    parser.add_argument('--rate', type=float, default=50.0, help="Open loop: commands per second")
+    parser.add_argument('--duration', type=float, default=30.0, help="Open loop: seconds of load")
+    parser.add_argument('--arrival', choices=('constant', 'poisson'), default='constant')
+    parser.add_argument('--requests-per-client', type=int, default=10, help="Closed loop: commands per tablet")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Closed loop: seconds between commands")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--output', default='load_test_details.json')
+    parser.add_argument('--store', default='results_store', help="Cross-run results store directory")
+    parser.add_argument('--snapshot', help="Write mergeable latency sketches for each run to this file")
+    parser.add_argument('--merge', nargs='+', metavar='SNAPSHOT',
+                        help="Combine snapshot files from parallel generators instead of running a test")
+    args = parser.parse_args()
+
+    if args.merge:
+        runs = []
+        for path in args.merge:
+            with open(path) as f:
+                runs.append(json.load(f))
+        # Snapshot files hold one entry per client count; merge them position by position
+        for snapshots in zip(*runs):
+            print_analysis(analyze_snapshot(merge_snapshots(snapshots)))
+            print()
+        return
+
+    tester = LoadTester(args.url, timeout=args.timeout)
+
+    results = []
+    snapshots = []
+    for clients in args.clients:
+        print(f"Running {args.mode}-loop load test with {clients} tablets...")
+        tester.store = ResultsWriter('load_test', args.store, metadata={
+            'clients': clients,
+            'mode': args.mode,
+            'rate': args.rate if args.mode == 'open' else None,
+            'arrival': args.arrival if args.mode == 'open' else None,
+            'think_time': args.think_time if args.mode == 'closed' else None
+        })
+        analysis = tester.run_load_test(
+            clients, TEST_CASES,
+            mode=args.mode,
+            rate=args.rate,
+            duration=args.duration,
+            arrival=args.arrival,
+            requests_per_client=args.requests_per_client,
+            think_time=args.think_time
         )
+        tester.store.close()
         results.append(analysis)
-        
-        print(f"Results for {clients} clients:")
-        print(f"  Success rate: {analysis['success_rate']:.2f}%")
-        print(f"  Average latency: {analysis['average_latency']:.3f}s")
-        print(f"  Throughput: {analysis['throughput']:.2f} requests/sec")
+        snapshots.append(tester.snapshot(analysis['total_time'], clients))
+        print_analysis(analysis)
         print()
-    
+
     # Save detailed results
-        with open('load_test_details.json', 'w') as f:
-            json.dump(results, f, indent=2)
-    
-    print("Load testing completed. Results saved to load_test_details.json")
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    if args.snapshot:
+        with open(args.snapshot, 'w') as f:
+            json.dump(snapshots, f)
+
+    print(f"Load testing completed. Results saved to {args.output}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,123 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+COMMAND_LOGGER = 'care_assistant.commands'
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with `extra=` fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [
+            f'{key}={value}' for key, value in vars(record).items()
+            if key not in _STANDARD_ATTRS and not key.startswith('_')
+        ]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Keep the record intact (args, extra fields) and let the
+        # background formatter do the work off the request thread
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_queue_handler = None
+
+
+def _stop_listener():
+    """Flush queued records and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def configure_logging(level='INFO', fmt='json', command_logs=True, max_queue_size=10000, stream=None):
+    """Route all logging through a queue drained by a background thread
+
+    Callers only pay for building the record and a non-blocking put; the
+    formatting and the write to stdout happen on the listener thread.
+    With `command_logs` off, per-command info logs are suppressed while
+    warnings and errors still get through.
+    """
+    global _listener, _queue_handler
+
+    _stop_listener()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=max_queue_size)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    logging.getLogger(COMMAND_LOGGER).setLevel(logging.NOTSET if command_logs else logging.WARNING)
+    return _queue_handler
+
+
+def dropped_records():
+    """Log records discarded because the queue was full"""
+    return _queue_handler.dropped if _queue_handler else 0
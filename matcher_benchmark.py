@@ -0,0 +1,99 @@
+import random
+import time
+import json
+from command_matcher import PhraseMatcher
+
+# Real phrases from the app, used as the base of every vocabulary
+BASE_PHRASES = [
+    "dark mode", "darker", "night mode", "too bright", "make it darker",
+    "light mode", "brighter", "day mode", "too dark", "make it brighter",
+    "bigger text", "increase text", "increase the text", "increase text size",
+    "text too small", "can't read", "smaller text", "decrease text",
+    "decrease the text", "decrease text size", "text too big",
+    "who am i", "my name", "emergency contact", "where do i live"
+]
+
+TRANSCRIPTS = [
+    "dark mode", "make it darker please", "the screen is too bright for me",
+    "could you make the text bigger", "i can barely read this",
+    "what time is it", "call my daughter", "play some music",
+    "increase text size a little bit", "switch to dark",
+    "hello can you tell me who am i", "please go back to day mode now"
+]
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "tu", "ve", "zo", "ne", "pi", "sha", "do", "bre"]
+
+
+def synthetic_phrases(count, seed=42):
+    """Generate made-up multi-word phrases to pad the vocabulary"""
+    rng = random.Random(seed)
+    phrases = BASE_PHRASES[:count]
+    seen = set(phrases)
+    while len(phrases) < count:
+        words = [
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+            for _ in range(rng.randint(1, 4))
+        ]
+        phrase = " ".join(words)
+        if phrase not in seen:
+            seen.add(phrase)
+            phrases.append(phrase)
+    return phrases
+
+
+def substring_scan(phrases, transcript):
+    """The original approach: first phrase found as a substring wins"""
+    for phrase in phrases:
+        if phrase in transcript:
+            return phrase
+    return None
+
+
+def time_lookups(func, transcripts, repeats):
+    """Return the mean time per lookup in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for transcript in transcripts:
+            func(transcript)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeats * len(transcripts)) * 1e6
+
+
+def run_benchmark(sizes=(25, 100, 1000, 10000), repeats=200):
+    """Compare substring scanning and the compiled matcher per vocabulary size"""
+    results = []
+    for size in sizes:
+        phrases = synthetic_phrases(size)
+
+        build_start = time.perf_counter()
+        matcher = PhraseMatcher({phrase: phrase for phrase in phrases})
+        build_time = time.perf_counter() - build_start
+
+        scan_us = time_lookups(lambda t: substring_scan(phrases, t), TRANSCRIPTS, repeats)
+        matcher_us = time_lookups(matcher.match, TRANSCRIPTS, repeats)
+
+        results.append({
+            'phrases': len(phrases),
+            'build_time_ms': build_time * 1000,
+            'substring_scan_us': scan_us,
+            'matcher_us': matcher_us
+        })
+    return results
+
+
+def main():
+    results = run_benchmark()
+
+    print("\n===== PHRASE MATCHER BENCHMARK =====")
+    print(f"{'Phrases':>8} {'Build (ms)':>12} {'Scan (us)':>12} {'Matcher (us)':>14}")
+    for r in results:
+        print(f"{r['phrases']:>8} {r['build_time_ms']:>12.2f} "
+              f"{r['substring_scan_us']:>12.2f} {r['matcher_us']:>14.2f}")
+
+    with open('matcher_benchmark_results.json', 'w') as f:
+        json.dump(results, f, indent=2)
+    print("\nResults saved to matcher_benchmark_results.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond fast paths to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with optional labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count], sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            snapshot = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+
+        lines = []
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class CallbackMetric:
+    """Counter or gauge whose value is read from a function at scrape time
+
+    The function returns a number, or a dict mapping label-value tuples to
+    numbers when `labelnames` is set.
+    """
+
+    def __init__(self, name, help, func, type='gauge', labelnames=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.type = type
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        value = self.func()
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [f'{self.name} {_format_value(value)}']
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}'
+            for key, v in sorted(value.items())
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, func, labelnames=()):
+        return self.register(CallbackMetric(name, help, func, 'gauge', labelnames))
+
+    def counter(self, name, help, func, labelnames=()):
+        return self.register(CallbackMetric(name, help, func, 'counter', labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.collect()
+            except Exception as e:
+                # A broken collector must not take the whole endpoint down
+                lines.append(f'# {metric.name} unavailable: {e}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class LapTimer:
+    """Records how long each named stage of a request took"""
+
+    def __init__(self, start=None):
+        self.started = start if start is not None else time.perf_counter()
+        self._last = self.started
+        self.stages = {}
+
+    def lap(self, stage):
+        """Close the current stage, charging time since the previous lap"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def total(self):
+        return self._last - self.started
+
+
+class _NullTimer:
+    """Stand-in used when a caller does not want stage timings"""
+
+    stages = {}
+
+    def lap(self, stage):
+        pass
+
+    def total(self):
+        return 0.0
+
+
+NULL_TIMER = _NullTimer()
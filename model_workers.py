@@ -0,0 +1,259 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+def _worker_main(load, conn, intra_op_threads):
+    """Load the classifier, then run the inference loop, inside each worker process"""
+    if intra_op_threads:
+        from inference import configure_torch_threads
+        configure_torch_threads(intra_op_threads)
+    try:
+        classifier = load()
+    except Exception as e:
+        conn.send((None, 'error', f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    conn.send((None, 'ready', os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        request_id, op, payload = message
+        if op == 'stop':
+            break
+        if op == 'ping':
+            conn.send((request_id, 'ok', os.getpid()))
+            continue
+
+        try:
+            sequences, labels, kwargs = payload
+            conn.send((request_id, 'ok', classifier(sequences, labels, **kwargs)))
+        except Exception as e:
+            conn.send((request_id, 'error', str(e)))
+    conn.close()
+
+
+class WorkerFailure(Exception):
+    """A worker process died, hung or broke the request protocol"""
+
+
+class _Worker:
+    """Parent-side handle for one worker process"""
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.requests = 0
+
+
+class ProcessClassifierPool:
+    """Runs a classifier in several worker processes
+
+    Each worker calls `load` (a picklable callable, such as a partial of
+    inference.load_classifier) to build its own copy of the model, so
+    pre/post-processing and inference run outside the server's GIL.
+    Calls block like the classifier itself and are sent to an idle worker
+    over a pipe. A health thread pings idle workers and replaces any that
+    died or stopped responding.
+
+    Workers use the 'spawn' start method. The server is multithreaded by
+    the time they start (model loader, health thread, command workers),
+    and forking a threaded process can leave a lock held forever in the
+    child. Spawned workers start from a fresh interpreter instead, at the
+    cost of loading the model once per worker. They also re-import the
+    server's main module, so it must not start serving at import time.
+    """
+
+    def __init__(self, load, num_workers=2, request_timeout=30,
+                 health_interval=5, intra_op_threads=None, threshold=None, load_timeout=300):
+        self.load = load
+        self.num_workers = max(1, int(num_workers))
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.intra_op_threads = intra_op_threads
+        self.load_timeout = load_timeout
+        self._threshold = threshold
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = []
+        self._closed = False
+
+        # Counters
+        self.restarts = 0
+        self.failures = 0
+
+        # Start every worker before waiting, so they load in parallel
+        self._workers = [self._spawn(index) for index in range(self.num_workers)]
+        try:
+            for worker in self._workers:
+                self._wait_ready(worker)
+        except WorkerFailure as e:
+            self.close()
+            raise RuntimeError(f"model workers failed to start: {e}")
+        for worker in self._workers:
+            self._idle.put(worker)
+
+        self._health_thread = threading.Thread(target=self._health_loop, name='model-worker-health', daemon=True)
+        self._health_thread.start()
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    def _spawn(self, index):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.load, child_conn, self.intra_op_threads),
+            name=f'model-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn)
+
+    def _wait_ready(self, worker):
+        """Block until a new worker has loaded its model"""
+        try:
+            if not worker.conn.poll(self.load_timeout):
+                raise WorkerFailure(f"model not loaded within {self.load_timeout}s")
+            _, status, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerFailure(f"exited while loading ({type(e).__name__})")
+        if status != 'ready':
+            raise WorkerFailure(f"model failed to load: {result}")
+
+    def _restart(self, worker, reason):
+        """Replace a worker in place; returns the new handle
+
+        Blocks while the replacement loads its model. A replacement that
+        fails to load is still returned; its next request or health check
+        fails and restarts it again.
+        """
+        log.warning("Restarting model worker", extra={'worker': worker.index, 'reason': reason})
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=1)
+
+        replacement = self._spawn(worker.index)
+        try:
+            self._wait_ready(replacement)
+        except WorkerFailure as e:
+            log.error("Replacement model worker failed to start", extra={'worker': worker.index, 'reason': str(e)})
+        with self._lock:
+            self._workers[worker.index] = replacement
+            self.restarts += 1
+        return replacement
+
+    def _request(self, worker, op, payload, timeout):
+        """Send one request and wait for its reply"""
+        request_id = next(self._ids)
+        try:
+            worker.conn.send((request_id, op, payload))
+            if not worker.conn.poll(timeout):
+                raise WorkerFailure(f"no reply within {timeout}s")
+            reply_id, status, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerFailure(f"connection lost ({type(e).__name__})")
+
+        if reply_id != request_id:
+            raise WorkerFailure("reply out of order")
+        if status == 'error':
+            # The classifier itself raised; the worker is still healthy
+            raise RuntimeError(result)
+        return result
+
+    def __call__(self, sequences, candidate_labels, **kwargs):
+        if self._closed:
+            raise RuntimeError("model worker pool is closed")
+
+        worker = self._idle.get()
+        try:
+            result = self._request(worker, 'classify', (sequences, list(candidate_labels), kwargs),
+                                   self.request_timeout)
+            worker.requests += 1
+            return result
+        except WorkerFailure as e:
+            with self._lock:
+                self.failures += 1
+            worker = self._restart(worker, str(e))
+            raise RuntimeError(f"model worker failed: {e}")
+        except RuntimeError:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            if self._closed:
+                break
+            self.check_health()
+
+    def check_health(self):
+        """Ping every idle worker once, replacing any that fail"""
+        for _ in range(self.num_workers):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                if not worker.process.is_alive():
+                    raise WorkerFailure(f"exited with code {worker.process.exitcode}")
+                self._request(worker, 'ping', None, timeout=min(5, self.request_timeout))
+            except WorkerFailure as e:
+                worker = self._restart(worker, f"health check failed: {e}")
+            finally:
+                self._idle.put(worker)
+
+    def close(self):
+        """Stop all worker processes"""
+        self._closed = True
+        for worker in list(self._workers):
+            try:
+                worker.conn.send((None, 'stop', None))
+            except OSError:
+                pass
+        for worker in list(self._workers):
+            worker.process.join(timeout=2)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.num_workers,
+                'idle_workers': self._idle.qsize(),
+                'restarts': self.restarts,
+                'failures': self.failures,
+                'processes': [
+                    {
+                        'index': w.index,
+                        'pid': w.process.pid,
+                        'alive': w.process.is_alive(),
+                        'requests': w.requests
+                    }
+                    for w in self._workers
+                ]
+            }
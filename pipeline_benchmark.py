@@ -0,0 +1,228 @@
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from latency_sketch import LatencySketch
+
+BASELINE_FILE = 'pipeline_baseline.json'
+
+FILLERS_BEFORE = ['please', 'um', 'can you', 'hey', 'i think', 'could you']
+FILLERS_AFTER = ['please', 'now', 'for me', 'thanks', 'right now', 'again']
+NOISE_WORDS = ['kitchen', 'weather', 'tomorrow', 'garden', 'music', 'lunch', 'doctor',
+               'window', 'blue', 'quickly', 'yesterday', 'television', 'walk', 'tea']
+
+
+class FakeEmitter:
+    """Stands in for socketio.emit and keeps the last reply per request"""
+
+    def __init__(self):
+        self.replies = {}
+        self.emitted = 0
+
+    def __call__(self, event, payload=None, to=None, skip_sid=None, **kwargs):
+        self.emitted += 1
+        if isinstance(payload, dict) and 'request_id' in payload:
+            self.replies[payload['request_id']] = (event, payload)
+
+
+class StubClassifier:
+    """Deterministic, near-free stand-in for the zero-shot model
+
+    A label scores high when it shares a word with the transcript, so the
+    model and unrecognized routes are both exercised without torch.
+    """
+
+    threshold = 0.5
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+
+    def _classify(self, sequence, labels):
+        words = set(sequence.split())
+        scored = sorted(
+            ((0.9 if words & set(label.split()) else 0.1, label) for label in labels),
+            key=lambda pair: -pair[0]
+        )
+        return {'sequence': sequence, 'labels': [l for _, l in scored], 'scores': [s for s, _ in scored]}
+
+    def __call__(self, sequences, candidate_labels, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(sequences, str):
+            return self._classify(sequences, candidate_labels)
+        return [self._classify(s, candidate_labels) for s in sequences]
+
+
+def synthetic_corpus(test_cases, size, seed=0):
+    """Paraphrase-like variants of the test commands plus unrelated chatter"""
+    rng = random.Random(seed)
+    commands = [tc['command'] for tc in test_cases]
+    corpus = []
+    for _ in range(size):
+        kind = rng.random()
+        if kind < 0.7:
+            parts = [rng.choice(commands)]
+            if rng.random() < 0.5:
+                parts.insert(0, rng.choice(FILLERS_BEFORE))
+            if rng.random() < 0.5:
+                parts.append(rng.choice(FILLERS_AFTER))
+            corpus.append(' '.join(parts))
+        else:
+            # Nothing to match - these fall through to the model
+            corpus.append(' '.join(rng.choices(NOISE_WORDS, k=rng.randint(2, 8))))
+    return corpus
+
+
+def setup_app(backend_name, stub_latency_ms, batch_wait_ms=None):
+    """Import the server in-process, with a fake emitter and a loaded model"""
+    import app
+    from inference import load_classifier
+
+    emitter = FakeEmitter()
+    app.socketio.emit = emitter
+
+    if backend_name == 'stub':
+        model = StubClassifier(stub_latency_ms)
+    else:
+        model = load_classifier(backend_name)
+    app.IDENTITY_CONFIDENCE_THRESHOLD = model.threshold
+    if batch_wait_ms is not None:
+        app.CLASSIFIER_BATCH_WAIT_MS = batch_wait_ms
+    app.initialize_app()
+    # Same path as a real start: batching wrapper and app_ready broadcast
+    app.on_model_ready(model)
+    return app, emitter
+
+
+def run_suite(app, emitter, commands, repeats, use_cache):
+    """Push every command through process_command_thread and time it"""
+    overall = LatencySketch()
+    per_route = {}
+    handled = 0
+    busy_time = 0.0
+
+    for _ in range(repeats):
+        for command in commands:
+            if not use_cache:
+                app.routing_cache.invalidate()
+            request_id = f'bench-{handled}'
+            start = time.perf_counter()
+            app.process_command_thread({'text': command, 'request_id': request_id}, 'bench-sid', start)
+            elapsed = time.perf_counter() - start
+            busy_time += elapsed
+            handled += 1
+
+            event, payload = emitter.replies.pop(request_id, ('none', {}))
+            route = payload.get('route', event)
+            overall.add(elapsed)
+            per_route.setdefault(route, LatencySketch()).add(elapsed)
+
+    quantiles = (0.5, 0.9, 0.99)
+    return {
+        'commands': handled,
+        'throughput': handled / busy_time if busy_time else 0,
+        'latency': overall.summary(quantiles),
+        'routes': {route: sketch.summary(quantiles) for route, sketch in sorted(per_route.items())}
+    }
+
+
+def find_regressions(current, baseline, threshold, min_us, min_count):
+    """Routes whose p50 or p99 grew by more than `threshold` over the baseline"""
+    regressions = []
+    for suite, result in current['suites'].items():
+        past_suite = baseline.get('suites', {}).get(suite)
+        if not past_suite:
+            continue
+        for route, stats in result['routes'].items():
+            past = past_suite['routes'].get(route)
+            if not past or stats['count'] < min_count or past['count'] < min_count:
+                continue
+            for key in ('p50', 'p99'):
+                now, before = stats[key], past[key]
+                if (now - before) * 1e6 > min_us and now > before * (1 + threshold):
+                    regressions.append(
+                        f"{suite}/{route} {key}: {now * 1e6:.1f}us vs baseline {before * 1e6:.1f}us"
+                    )
+    return regressions
+
+
+def print_results(results):
+    for suite, result in results['suites'].items():
+        print(f"\n===== {suite.upper()} ({result['commands']} commands, "
+              f"{result['throughput']:.0f} commands/s) =====")
+        print(f"{'Route':<18} {'Count':>7} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'max us':>9}")
+        for route, s in [('all', result['latency'])] + list(result['routes'].items()):
+            print(f"{route:<18} {s['count']:>7} {s['p50'] * 1e6:>9.1f} {s['p90'] * 1e6:>9.1f} "
+                  f"{s['p99'] * 1e6:>9.1f} {s['max'] * 1e6:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark command routing in-process, without a server")
+    parser.add_argument('--backend', default='stub',
+                        help="'stub' for a deterministic fake model, or a real backend name")
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0, help="Simulated model cost")
+    parser.add_argument('--batch-wait-ms', type=float,
+                        help="Override CLASSIFIER_BATCH_WAIT_MS (single-threaded runs never fill a batch)")
+    parser.add_argument('--corpus-size', type=int, default=5000)
+    parser.add_argument('--repeats', type=int, default=20, help="Passes over the test cases")
+    parser.add_argument('--cache', action='store_true', help="Keep the routing cache warm between commands")
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_FILE, metavar='PATH')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_FILE, metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument('--min-us', type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument('--min-count', type=int, default=20, help="Skip routes with fewer samples")
+    parser.add_argument('--output', help="Also write the results JSON to this file")
+    args = parser.parse_args()
+
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+
+    app, emitter = setup_app(args.backend, args.stub_latency_ms, args.batch_wait_ms)
+    suites = {
+        'test_cases': ([tc['command'] for tc in TEST_CASES], args.repeats),
+        'negative_test_cases': ([tc['command'] for tc in NEGATIVE_TEST_CASES], args.repeats),
+        'synthetic': (synthetic_corpus(TEST_CASES, args.corpus_size), 1)
+    }
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'backend': args.backend,
+        'cache': args.cache,
+        'batch_wait_ms': app.CLASSIFIER_BATCH_WAIT_MS,
+        'python': sys.version.split()[0],
+        'suites': {
+            name: run_suite(app, emitter, commands, repeats, args.cache)
+            for name, (commands, repeats) in suites.items()
+        }
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        settings = ('backend', 'cache', 'batch_wait_ms')
+        if any(baseline.get(key) != results[key] for key in settings):
+            print("\nBaseline was recorded with different settings: "
+                  + ', '.join(f"{key}={baseline.get(key)}" for key in settings))
+            return 2
+        regressions = find_regressions(results, baseline, args.threshold, args.min_us, args.min_count)
+        if regressions:
+            print("\n❌ Routing regressions:")
+            for r in regressions:
+                print(f"  {r}")
+            return 1
+        print("\n✅ No routing regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Threads that run command handling and inference
+DEFAULT_THREAD_PREFIXES = ('command-worker', 'classifier-batcher')
+
+_active = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiling session is already running"""
+
+
+def _frame_label(code):
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ';' separates frames in the collapsed format
+    return name.replace(';', ':')
+
+
+class SamplingProfiler:
+    """Low-overhead wall-clock sampling profiler for selected threads
+
+    A background thread periodically reads every thread's current stack
+    via sys._current_frames() and counts identical stacks. The sampling
+    interval stretches automatically so the time spent sampling never
+    exceeds `max_overhead` of wall time, which keeps it safe on live
+    traffic. Only one session can run at a time. Pass the server's
+    cooperative `sleep` when running under an event loop such as eventlet,
+    so waiting between samples does not block it.
+    """
+
+    def __init__(self, interval=0.005, max_overhead=0.02, thread_prefixes=DEFAULT_THREAD_PREFIXES,
+                 max_depth=64, sleep=time.sleep):
+        self.interval = interval
+        self.sleep = sleep
+        self.max_overhead = max_overhead
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.max_depth = max_depth
+
+    def _target_threads(self, own_ident):
+        return {
+            t.ident: t.name for t in threading.enumerate()
+            if t.ident != own_ident and (not self.thread_prefixes or t.name.startswith(self.thread_prefixes))
+        }
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def profile(self, duration):
+        """Sample for `duration` seconds and return the aggregated result"""
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("a profiling session is already running")
+        try:
+            return self._run(duration)
+        finally:
+            _active.release()
+
+    def _run(self, duration):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        sampling_time = 0.0
+        started = time.perf_counter()
+        deadline = started + duration
+        targets = self._target_threads(own_ident)
+        next_refresh = started + 1.0
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now >= next_refresh:
+                # Pick up workers that were (re)started during the session
+                targets = self._target_threads(own_ident)
+                next_refresh = now + 1.0
+
+            sample_start = time.perf_counter()
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident in targets:
+                    stacks[self._stack(frame)] += 1
+            del frames
+            samples += 1
+            cost = time.perf_counter() - sample_start
+            sampling_time += cost
+
+            # Sleep long enough that sampling stays under the overhead cap
+            pause = max(self.interval, cost / self.max_overhead - cost)
+            self.sleep(min(pause, max(0.0, deadline - time.perf_counter())))
+
+        elapsed = time.perf_counter() - started
+        return self._report(stacks, samples, elapsed, sampling_time)
+
+    def _report(self, stacks, samples, elapsed, sampling_time, top=20):
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in stacks.items():
+            if stack:
+                self_counts[stack[-1]] += count
+            for label in set(stack):
+                inclusive_counts[label] += count
+
+        total = sum(stacks.values())
+
+        def ranked(counter):
+            return [
+                {'function': label, 'samples': count, 'percent': count / total * 100 if total else 0}
+                for label, count in counter.most_common(top)
+            ]
+
+        return {
+            'duration_seconds': elapsed,
+            'samples': samples,
+            'stack_samples': total,
+            'overhead': sampling_time / elapsed if elapsed else 0,
+            'collapsed': '\n'.join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()),
+            'top_self': ranked(self_counts),
+            'top_inclusive': ranked(inclusive_counts)
+        }
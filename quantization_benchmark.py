@@ -0,0 +1,88 @@
+import json
+import argparse
+import multiprocessing
+from resource_usage import current_rss_mb, peak_rss_mb
+
+
+def measure_backend(name, repeats, conn):
+    """Run in a fresh process so each backend's memory is measured alone"""
+    from classifier_benchmark import evaluate_backend
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+
+    baseline_rss = current_rss_mb()
+    result = evaluate_backend(name, TEST_CASES + NEGATIVE_TEST_CASES, repeats)
+    result['baseline_rss_mb'] = baseline_rss
+    result['rss_mb'] = current_rss_mb()
+    result['model_rss_mb'] = result['rss_mb'] - baseline_rss
+    result['peak_rss_mb'] = peak_rss_mb()
+    conn.send(result)
+    conn.close()
+
+
+def run_isolated(name, repeats):
+    ctx = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=measure_backend, args=(name, repeats, child_conn))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def parity_report(reference, candidate):
+    """List test cases where the two backends route differently"""
+    mismatches = []
+    for ref, cand in zip(reference['decisions'], candidate['decisions']):
+        if (ref['route'], ref['action']) != (cand['route'], cand['action']):
+            mismatches.append({
+                'command': ref['command'],
+                reference['backend']: f"{ref['route']}/{ref['action']}",
+                candidate['backend']: f"{cand['route']}/{cand['action']}"
+            })
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare int8 quantized inference with fp32")
+    parser.add_argument('--reference', default='pipeline')
+    parser.add_argument('--candidate', default='quantized')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default='quantization_benchmark_results.json')
+    args = parser.parse_args()
+
+    reference = run_isolated(args.reference, args.repeats)
+    candidate = run_isolated(args.candidate, args.repeats)
+    mismatches = parity_report(reference, candidate)
+
+    print("\n===== QUANTIZATION BENCHMARK =====")
+    print(f"{'':24} {args.reference:>12} {args.candidate:>12}")
+    for key, label in [('accuracy', 'Routing accuracy (%)'),
+                       ('mean_latency_ms', 'Mean latency (ms)'),
+                       ('p50_latency_ms', 'p50 latency (ms)'),
+                       ('p99_latency_ms', 'p99 latency (ms)'),
+                       ('load_time_s', 'Load time (s)'),
+                       ('model_rss_mb', 'Model RSS (MB)'),
+                       ('peak_rss_mb', 'Peak RSS (MB)')]:
+        cells = [f"{r[key]:>12.2f}" if r[key] is not None else f"{'-':>12}" for r in (reference, candidate)]
+        print(f"{label:24} {' '.join(cells)}")
+
+    if mismatches:
+        print(f"\n❌ Routing parity: {len(mismatches)} decision(s) differ")
+        for m in mismatches:
+            print(f"  {m}")
+    else:
+        print("\n✅ Routing parity: all decisions match")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'reference': reference,
+            'candidate': candidate,
+            'mismatches': mismatches
+        }, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import time
+from latency_sketch import LatencySketch
+from load_test import VirtualTablet
+from traffic_capture import read_capture
+
+# Cached answers hide which path made the original decision
+UNCOMPARABLE_ROUTES = {'cache_hit'}
+
+
+class TrafficReplayer:
+    """Sends captured traffic back at a server and compares the answers
+
+    Each captured session gets its own connection and replays its commands
+    strictly in order; sessions run side by side. Arrival times are kept
+    relative to the start of the capture and divided by `speed` (0 sends
+    everything as fast as possible). Latency is measured from when a
+    command was due, as in load_test.py.
+    """
+
+    def __init__(self, base_url="http://localhost:5000", speed=1.0, timeout=10, max_examples=20):
+        self.base_url = base_url
+        self.speed = speed
+        self.timeout = timeout
+        self.max_examples = max_examples
+        self.replayed = 0
+        self.failures = 0
+        self.route_mismatches = 0
+        self.outcome_mismatches = 0
+        self.compared_routes = 0
+        self.examples = []
+        self.captured_latency = {}
+        self.replay_latency = {}
+
+    def _due(self, start, first_arrival, record):
+        if not self.speed:
+            return time.perf_counter()
+        return start + (record['t'] - first_arrival) / self.speed
+
+    async def _session(self, records, start, first_arrival):
+        tablet = VirtualTablet(self.base_url)
+        try:
+            await tablet.connect()
+        except Exception as e:
+            print(f"Session connection error: {e}")
+            self.failures += len(records)
+            return
+        try:
+            for record in records:
+                due = self._due(start, first_arrival, record)
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._replay(tablet, record, due)
+        finally:
+            await tablet.disconnect()
+
+    async def _replay(self, tablet, record, due):
+        self.replayed += 1
+        try:
+            event, data, received_at = await tablet.send(record['x'], self.timeout)
+        except Exception as e:
+            self.failures += 1
+            self._example(record, 'failed', str(e) or type(e).__name__)
+            return
+
+        route = data.get('route', event)
+        outcome = data.get('action', event)
+        self.captured_latency.setdefault(record['r'], LatencySketch()).add(record['ms'] / 1000)
+        self.replay_latency.setdefault(route, LatencySketch()).add(received_at - due)
+
+        if outcome != record['a']:
+            self.outcome_mismatches += 1
+            self._example(record, 'outcome', outcome, route)
+        if record['r'] not in UNCOMPARABLE_ROUTES and route not in UNCOMPARABLE_ROUTES:
+            self.compared_routes += 1
+            if route != record['r']:
+                self.route_mismatches += 1
+                self._example(record, 'route', outcome, route)
+
+    def _example(self, record, kind, outcome, route=None):
+        if len(self.examples) < self.max_examples:
+            self.examples.append({
+                'kind': kind,
+                'transcript': record['x'],
+                'captured_route': record['r'],
+                'captured_outcome': record['a'],
+                'replay_route': route,
+                'replay_outcome': outcome
+            })
+
+    async def run(self, records):
+        sessions = {}
+        for record in records:
+            sessions.setdefault(record['s'], []).append(record)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            self._session(session, start, records[0]['t']) for session in sessions.values()
+        ))
+        elapsed = time.perf_counter() - start
+        return self.report(len(sessions), records, elapsed)
+
+    def report(self, sessions, records, elapsed):
+        quantiles = (0.5, 0.99)
+        routes = sorted(set(self.captured_latency) | set(self.replay_latency))
+        return {
+            'speed': self.speed or 'max',
+            'sessions': sessions,
+            'captured_span_seconds': records[-1]['t'] - records[0]['t'],
+            'replay_seconds': elapsed,
+            'replayed': self.replayed,
+            'failed': self.failures,
+            'outcome_mismatches': self.outcome_mismatches,
+            'route_mismatches': self.route_mismatches,
+            'compared_routes': self.compared_routes,
+            # Captured times are server-side; replay times include the network
+            'latency': {
+                route: {
+                    'captured': self.captured_latency[route].summary(quantiles)
+                    if route in self.captured_latency else None,
+                    'replay': self.replay_latency[route].summary(quantiles)
+                    if route in self.replay_latency else None
+                }
+                for route in routes
+            },
+            'examples': self.examples
+        }
+
+
+def print_report(report):
+    speed = 'full speed' if report['speed'] == 'max' else f"{report['speed']:g}x"
+    print(f"Replayed {report['replayed']} commands from {report['sessions']} sessions at "
+          f"{speed}: {report['captured_span_seconds']:.1f}s of traffic in "
+          f"{report['replay_seconds']:.1f}s")
+    print(f"  Failed/timed out: {report['failed']}")
+    print(f"  Outcome mismatches: {report['outcome_mismatches']}")
+    print(f"  Route mismatches: {report['route_mismatches']} of {report['compared_routes']} comparable")
+
+    print(f"\n  {'Route':<18} {'Captured':>9} {'p50 ms':>8} {'p99 ms':>8} {'Replayed':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for route, pair in report['latency'].items():
+        cells = []
+        for side in ('captured', 'replay'):
+            s = pair[side]
+            if s:
+                cells.append(f"{s['count']:>9} {s['p50'] * 1000:>8.1f} {s['p99'] * 1000:>8.1f}")
+            else:
+                cells.append(f"{'-':>9} {'':>8} {'':>8}")
+        print(f"  {route:<18} {' '.join(cells)}")
+    print("  (captured latency is server time; replayed latency includes the network)")
+
+    if report['examples']:
+        print("\n  Divergences:")
+        for ex in report['examples']:
+            print(f"    [{ex['kind']}] {ex['transcript']!r}: {ex['captured_route']}/{ex['captured_outcome']}"
+                  f" -> {ex['replay_route']}/{ex['replay_outcome']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic and report divergences")
+    parser.add_argument('capture', help="Capture log (TRAFFIC_CAPTURE_PATH); rotated backups are included")
+    parser.add_argument('--url', default="http://localhost:5000")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed multiple of the captured timing; 0 = as fast as possible")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--output', help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    # Commands that failed before a transcript existed cannot be replayed
+    records = [r for r in read_capture(args.capture) if r.get('x')]
+    if not records:
+        print(f"No captured commands in {args.capture}")
+        return 1
+
+    replayer = TrafficReplayer(args.url, speed=args.speed, timeout=args.timeout)
+    report = asyncio.run(replayer.run(records))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    diverged = report['failed'] or report['outcome_mismatches'] or report['route_mismatches']
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
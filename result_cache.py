@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from command_matcher import tokenize
+
+
+def normalize_transcript(text):
+    """Lowercase and collapse punctuation/whitespace into single spaces"""
+    return " ".join(tokenize(text))
+
+
+def config_fingerprint(*configs):
+    """Stable hash of configuration objects, used to invalidate the cache"""
+    encoded = json.dumps(configs, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class RoutingCache:
+    """Size-bounded LRU cache of routing decisions with TTL expiry
+
+    Keys are normalized transcripts. Entries are dropped when they are older
+    than `ttl` seconds, when the cache is full (least recently used first),
+    or all at once when the configuration fingerprint changes.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def set_version(self, version):
+        """Record the config fingerprint, clearing the cache if it changed"""
+        if version != self.version:
+            if self.version is not None:
+                self.invalidate()
+            self.version = version
+
+    def stats(self):
+        """Return hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
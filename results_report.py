@@ -0,0 +1,108 @@
+import argparse
+import json
+from latency_sketch import LatencyBreakdown
+from results_store import DEFAULT_STORE, RunAggregates, read_runs
+
+
+def summarize(breakdown, action=None):
+    """Count, success rate and latency percentiles, optionally for one action"""
+    summary = breakdown.summary()
+    if action is not None:
+        summary = summary['groups'].get(action)
+        if summary is None:
+            return None
+    latency = summary['latency']
+    return {
+        'count': summary['total'],
+        'success_rate': summary['success_rate'],
+        'p50': latency['p50'],
+        'p90': latency['p90'],
+        'p99': latency['p99']
+    }
+
+
+def build_trends(runs, aggregates, action=None):
+    """Per-run rows plus per-build rows (runs of one revision merged), oldest first"""
+    per_run = []
+    per_build = {}
+    for run in sorted(runs, key=lambda r: r['started']):
+        breakdown = aggregates.by_run.get(run['run_id'])
+        if breakdown is None:
+            continue
+        stats = summarize(breakdown, action)
+        if stats is None or not stats['count']:
+            continue
+        per_run.append(dict(stats, run_id=run['run_id'], source=run['source'],
+                            revision=run['revision'], started=run['started']))
+        # Dicts keep insertion order, so builds stay in order of first run
+        key = (run['source'], run['revision'])
+        per_build.setdefault(key, LatencyBreakdown()).merge(breakdown)
+
+    builds = []
+    previous = {}
+    for (source, revision), breakdown in per_build.items():
+        stats = summarize(breakdown, action)
+        if stats is None or not stats['count']:
+            continue
+        before = previous.get(source)
+        if before:
+            stats['p50_change'] = _relative_change(stats['p50'], before['p50'])
+            stats['p99_change'] = _relative_change(stats['p99'], before['p99'])
+            stats['success_change'] = stats['success_rate'] - before['success_rate']
+        previous[source] = stats
+        builds.append(dict(stats, source=source, revision=revision))
+    return per_run, builds
+
+
+def _relative_change(now, before):
+    if now is None or not before:
+        return None
+    return (now - before) / before * 100
+
+
+def print_report(per_run, builds):
+    print("===== RUNS =====")
+    print(f"{'Started':<20} {'Source':<12} {'Revision':<10} {'Count':>7} {'Success':>8} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for r in per_run:
+        print(f"{r['started'][:19]:<20} {r['source']:<12} {str(r['revision']):<10} {r['count']:>7} "
+              f"{r['success_rate']:>7.1f}% {r['p50'] * 1000:>9.1f} {r['p90'] * 1000:>9.1f} "
+              f"{r['p99'] * 1000:>9.1f}")
+
+    print("\n===== TREND BY BUILD =====")
+    print(f"{'Source':<12} {'Revision':<10} {'Count':>7} {'Success':>8} {'p50 ms':>9} {'p99 ms':>9}  Change")
+    for b in builds:
+        change = ''
+        if 'p50_change' in b:
+            change = (f"p50 {b['p50_change']:+.1f}%, p99 {b['p99_change']:+.1f}%, "
+                      f"success {b['success_change']:+.1f} pts")
+        print(f"{b['source']:<12} {str(b['revision']):<10} {b['count']:>7} {b['success_rate']:>7.1f}% "
+              f"{b['p50'] * 1000:>9.1f} {b['p99'] * 1000:>9.1f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and accuracy trends across stored test runs")
+    parser.add_argument('--store', default=DEFAULT_STORE)
+    parser.add_argument('--source', help="Only runs from this harness (run_tests, load_test, audio_test)")
+    parser.add_argument('--action', help="Only results for this expected action")
+    parser.add_argument('--last', type=int, help="Only the most recent N runs")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    aggregates = RunAggregates(args.store)
+    folded = aggregates.update()
+
+    runs = [r for r in read_runs(args.store) if not args.source or r['source'] == args.source]
+    if args.last:
+        runs = sorted(runs, key=lambda r: r['started'])[-args.last:]
+    per_run, builds = build_trends(runs, aggregates, args.action)
+
+    if args.json:
+        print(json.dumps({'runs': per_run, 'builds': builds}, indent=2))
+    else:
+        print(f"({folded} new segment(s) aggregated)\n")
+        print_report(per_run, builds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from latency_sketch import LatencyBreakdown
+from build_info import git_revision
+
+DEFAULT_STORE = 'results_store'
+RUNS_FILE = 'runs.jsonl'
+SEGMENT_DIR = 'segments'
+AGGREGATES_FILE = 'aggregates.json'
+
+# Every segment has exactly these columns; harnesses that do not know a
+# value (load tests have no actual_action, say) leave it as None
+COLUMNS = ('ts', 'command', 'expected_action', 'actual_action', 'route', 'latency', 'success')
+
+
+class ResultsWriter:
+    """Appends one run's results to the store as they arrive
+
+    Rows are buffered and written out as immutable column-oriented
+    segments (gzipped JSON with one list per column); nothing already
+    written is ever rewritten. Call close() to write the last rows.
+    """
+
+    def __init__(self, source, store_dir=DEFAULT_STORE, metadata=None, flush_rows=500):
+        self.store_dir = store_dir
+        self.source = source
+        self.flush_rows = flush_rows
+        self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.rows = 0
+        self._buffer = {column: [] for column in COLUMNS}
+        self._segments = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(store_dir, SEGMENT_DIR), exist_ok=True)
+        run = {
+            'run_id': self.run_id,
+            'source': source,
+            'started': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'metadata': metadata or {}
+        }
+        with open(os.path.join(store_dir, RUNS_FILE), 'a') as f:
+            f.write(json.dumps(run) + '\n')
+
+    def append(self, result):
+        """Add one result dict (the shape test_framework and load_test produce)"""
+        row = {
+            'ts': time.time(),
+            'command': result.get('command'),
+            'expected_action': result.get('expected_action'),
+            'actual_action': result.get('actual_action'),
+            'route': result.get('route'),
+            'latency': result.get('latency'),
+            'success': bool(result.get('success'))
+        }
+        with self._lock:
+            for column in COLUMNS:
+                self._buffer[column].append(row[column])
+            self.rows += 1
+            if len(self._buffer['ts']) >= self.flush_rows:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        count = len(self._buffer['ts'])
+        if not count:
+            return
+        name = f"{self.run_id}-{self._segments:05d}.json.gz"
+        path = os.path.join(self.store_dir, SEGMENT_DIR, name)
+        # Write then rename, so readers never see a partial segment
+        with gzip.open(path + '.tmp', 'wt') as f:
+            json.dump({'run_id': self.run_id, 'rows': count, 'columns': self._buffer}, f)
+        os.replace(path + '.tmp', path)
+        self._segments += 1
+        self._buffer = {column: [] for column in COLUMNS}
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+
+def read_runs(store_dir=DEFAULT_STORE):
+    path = os.path.join(store_dir, RUNS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_segment(path, columns=COLUMNS):
+    with gzip.open(path, 'rt') as f:
+        segment = json.load(f)
+    return segment['run_id'], {column: segment['columns'][column] for column in columns}
+
+
+class RunAggregates:
+    """Per-run latency sketches, updated incrementally from new segments
+
+    The folded state is saved next to the data together with the names of
+    the segments it covers. Segments never change once written, so each
+    report only reads segments added since the last one.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE):
+        self.store_dir = store_dir
+        self.path = os.path.join(store_dir, AGGREGATES_FILE)
+        self.folded = set()
+        self.by_run = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.folded = set(state['folded'])
+            self.by_run = {run: LatencyBreakdown.from_dict(b) for run, b in state['by_run'].items()}
+
+    def update(self):
+        """Fold in segments written since the last update; returns how many"""
+        segment_dir = os.path.join(self.store_dir, SEGMENT_DIR)
+        if not os.path.isdir(segment_dir):
+            return 0
+        new = sorted(
+            name for name in os.listdir(segment_dir)
+            if name.endswith('.json.gz') and name not in self.folded
+        )
+        for name in new:
+            run_id, columns = read_segment(
+                os.path.join(segment_dir, name), ('expected_action', 'latency', 'success')
+            )
+            breakdown = self.by_run.setdefault(run_id, LatencyBreakdown())
+            for action, latency, success in zip(columns['expected_action'], columns['latency'],
+                                                columns['success']):
+                if latency is not None:
+                    breakdown.add(action, latency, success)
+            self.folded.add(name)
+        if new:
+            self.save()
+        return len(new)
+
+    def save(self):
+        state = {
+            'folded': sorted(self.folded),
+            'by_run': {run: breakdown.to_dict() for run, breakdown in self.by_run.items()}
+        }
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.path + '.tmp', self.path)
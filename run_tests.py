@@ -1,4 +1,5 @@
 from test_framework import VoiceAssistantTester
+from results_store import ResultsWriter
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
@@ -113,15 +114,16 @@ def main():
     output_dir = create_test_directory()
     print(f"Test results will be saved to: {output_dir}")
     
-    # Initialize tester
-    tester = VoiceAssistantTester()
-    
-    # Connect to server
-    if not tester.connect():
-        print("Failed to connect to server. Make sure the app is running.")
-        return
+    # Initialize tester; every result is also appended to the cross-run store
+    store = ResultsWriter('run_tests', metadata={'output_dir': output_dir})
+    tester = VoiceAssistantTester(store=store)
     
     try:
+        # Connect to server
+        if not tester.connect():
+            print("Failed to connect to server. Make sure the app is running.")
+            return
+        
         # Run positive test cases
         print(f"Running {len(TEST_CASES)} positive test cases...")
         results = tester.run_test_suite(TEST_CASES)
@@ -153,6 +155,7 @@ def main():
     finally:
         # Disconnect from server
         tester.disconnect()
+        store.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,408 @@
+import collections
+import hashlib
+import logging
+import os
+import threading
+import wave
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def transcript_from_filename(filename):
+    """'command_001_make_it_darker.wav' -> 'make it darker'"""
+    stem = os.path.basename(filename).rsplit('.', 1)[0]
+    parts = stem.split('_', 2)
+    return parts[2].replace('_', ' ') if len(parts) == 3 else stem.replace('_', ' ')
+
+
+def pcm_digest(pcm):
+    return hashlib.sha256(pcm).hexdigest()
+
+
+# Formats the server accepts on the audio events
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 48000
+SAMPLE_WIDTHS = (2,)
+MAX_CHANNELS = 2
+
+
+def _whole_number(value, name):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be a whole number, got {value!r}")
+    return value
+
+
+class AudioStream:
+    """PCM received for one utterance, plus its format
+
+    Raises ValueError for a format outside what the server accepts:
+    16-bit PCM, 8-48 kHz, mono or stereo.
+    """
+
+    def __init__(self, sample_rate, sample_width=2, channels=1, max_seconds=30):
+        self.sample_rate = _whole_number(sample_rate, 'sample_rate')
+        self.sample_width = _whole_number(sample_width, 'sample_width')
+        self.channels = _whole_number(channels, 'channels')
+        if not MIN_SAMPLE_RATE <= self.sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz, got {self.sample_rate}")
+        if self.sample_width not in SAMPLE_WIDTHS:
+            raise ValueError(f"sample_width must be 2 bytes, got {self.sample_width}")
+        if not 1 <= self.channels <= MAX_CHANNELS:
+            raise ValueError(f"channels must be 1-{MAX_CHANNELS}, got {self.channels}")
+        self.max_bytes = int(max_seconds * self.sample_rate * self.sample_width * self.channels)
+        self.chunks = []
+        self.size = 0
+
+    def append(self, chunk):
+        """Add a chunk; returns False once the stream would exceed max_seconds"""
+        if self.size + len(chunk) > self.max_bytes:
+            return False
+        self.chunks.append(bytes(chunk))
+        self.size += len(chunk)
+        return True
+
+    def pcm(self):
+        return b''.join(self.chunks)
+
+    def duration(self):
+        return self.size / (self.sample_rate * self.sample_width * self.channels)
+
+
+def frame_dbfs(samples, frame_length):
+    """Level of each complete frame of int16 samples, in dB relative to full scale"""
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms / 32768 + 1e-10)
+
+
+class EnergyVAD:
+    """Frame-energy voice activity detector for a stream of 16-bit PCM
+
+    Speech starts after `min_speech_ms` of consecutive frames above
+    `threshold_db`, and ends once `hangover_ms` of quieter frames follow,
+    which bridges the short dips between words.
+    """
+
+    def __init__(self, sample_rate, sample_width=2, channels=1, frame_ms=20,
+                 threshold_db=-40.0, hangover_ms=400, min_speech_ms=60):
+        if sample_width != 2:
+            raise ValueError("EnergyVAD needs 16-bit PCM")
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * channels * sample_width
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self._pending = b''
+        self._frames_seen = 0
+        self._speech_run = 0
+        self._silence_run = 0
+        self.speech_started = False
+        self.ended = False
+        self.speech_start_byte = None
+        self.speech_end_byte = None
+
+    def feed(self, pcm):
+        """Process a chunk; returns True once the end of speech has been detected"""
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable or self.ended:
+            return self.ended
+
+        levels = frame_dbfs(np.frombuffer(data[:usable], dtype='<i2'), self.frame_bytes // 2)
+        for loud in (levels > self.threshold_db).tolist():
+            self._frames_seen += 1
+            if loud:
+                self._speech_run += 1
+                self._silence_run = 0
+                if not self.speech_started and self._speech_run >= self.min_speech_frames:
+                    self.speech_started = True
+                    self.speech_start_byte = (self._frames_seen - self._speech_run) * self.frame_bytes
+                if self.speech_started:
+                    self.speech_end_byte = self._frames_seen * self.frame_bytes
+            else:
+                self._speech_run = 0
+                self._silence_run += 1
+                if self.speech_started and self._silence_run >= self.hangover_frames:
+                    self.ended = True
+                    break
+        return self.ended
+
+
+class BufferedRecognition:
+    """Adapts a whole-utterance recognizer to the incremental interface (no partials)"""
+
+    def __init__(self, recognizer, stream):
+        self.recognizer = recognizer
+        self.stream = stream
+
+    def feed(self, chunk):
+        return None
+
+    def finish(self):
+        return self.recognizer.transcribe(self.stream)
+
+
+def start_recognition(recognizer, stream, mid_stream=False):
+    """Incremental recognition session for a stream: feed(chunk) -> partial or None, finish() -> text
+
+    `mid_stream` says the audio may start part way into what was spoken,
+    as it does behind a wake word gate.
+    """
+    if hasattr(recognizer, 'start_stream'):
+        return recognizer.start_stream(stream, mid_stream=mid_stream)
+    return BufferedRecognition(recognizer, stream)
+
+
+# Queued after the last chunk of an utterance
+END_OF_AUDIO = object()
+
+
+class Utterance:
+    """One streamed utterance: its audio, endpoint detection and recognition
+
+    feed() returns the new partial transcript when it changes. Once the
+    command has been acted on, `committed_at` records when and `trigger`
+    why ('partial', 'endpoint' or 'audio_end'); later chunks are ignored.
+    An optional `gate` (such as a wake word spotter) sees the audio first:
+    its feed() returns None while it holds audio back, then the audio to
+    pass on. Nothing is buffered or recognized until the gate opens.
+
+    Chunks can be queued with enqueue() and taken back in order with
+    next_chunk(), so one worker at a time feeds them while the receiver
+    only appends. enqueue() returns True when nothing is draining the
+    queue and the caller must start a drain.
+    """
+
+    def __init__(self, recognizer, stream, vad=True, gate=None):
+        self.stream = stream
+        self.gate = gate
+        self.vad = EnergyVAD(stream.sample_rate, stream.sample_width, stream.channels) \
+            if vad and stream.sample_width == 2 else None
+        self.recognition = start_recognition(recognizer, stream, mid_stream=gate is not None)
+        self.partial = ''
+        self.committed_at = None
+        self.trigger = None
+        self.ended_at = None
+        self._pending = collections.deque()
+        self.pending_bytes = 0
+        self._draining = False
+        self._lock = threading.Lock()
+
+    def enqueue(self, chunk):
+        with self._lock:
+            self._pending.append(chunk)
+            if chunk is not END_OF_AUDIO:
+                self.pending_bytes += len(chunk)
+            if self._draining:
+                return False
+            self._draining = True
+            return True
+
+    def end(self, at):
+        """Queue the end of the audio, received at `at`"""
+        self.ended_at = at
+        return self.enqueue(END_OF_AUDIO)
+
+    def next_chunk(self):
+        """The oldest queued chunk; None ends the drain"""
+        with self._lock:
+            if not self._pending:
+                self._draining = False
+                return None
+            chunk = self._pending.popleft()
+            if chunk is not END_OF_AUDIO:
+                self.pending_bytes -= len(chunk)
+            return chunk
+
+    @property
+    def committed(self):
+        return self.committed_at is not None
+
+    @property
+    def awake(self):
+        return self.gate is None or self.gate.awake
+
+    def endpointed(self):
+        return self.vad is not None and self.vad.ended
+
+    def feed(self, chunk):
+        """Add a chunk; raises OverflowError once the stream passes max_seconds"""
+        if self.gate is not None:
+            chunk = self.gate.feed(chunk)
+            if chunk is None:
+                return None
+        if not self.stream.append(chunk):
+            raise OverflowError("Audio stream exceeded its maximum length")
+        if self.vad is not None:
+            self.vad.feed(chunk)
+        partial = self.recognition.feed(chunk)
+        if partial is not None:
+            self.partial = partial
+        return partial
+
+    def commit(self, trigger, at):
+        self.committed_at = at
+        self.trigger = trigger
+
+    def transcript(self):
+        return self.recognition.finish()
+
+
+class _StubReference:
+    def __init__(self, pcm, transcript, speech_start, speech_end):
+        self.pcm = pcm
+        self.words = transcript.split()
+        self.speech_start = speech_start
+        self.speech_end = speech_end
+
+
+def _sample_offsets(pcm, chunk):
+    """Every sample-aligned position of chunk in pcm"""
+    position = pcm.find(chunk)
+    while position != -1:
+        if position % 2 == 0:
+            yield position
+        position = pcm.find(chunk, position + 1)
+
+
+class _StubRecognition:
+    """Incremental stub session: narrows the reference files by PCM prefix
+
+    Candidates are (reference, offset of the stream's first byte). With
+    `mid_stream` the first chunk may come from anywhere in a reference,
+    as audio after a wake word does; the words spoken before it are
+    dropped in proportion to how far into the speech it starts.
+
+    The partial transcript reveals words in proportion to how much of the
+    reference's speech has arrived, so the full transcript appears once
+    the speech (not the trailing silence) has been received.
+    """
+
+    def __init__(self, references, stream, mid_stream=False):
+        self.references = list(references)
+        self.candidates = None if mid_stream else [(ref, 0) for ref in self.references]
+        self.stream = stream
+        self.received = 0
+        self.partial = ''
+
+    def feed(self, chunk):
+        if self.candidates is None:
+            if not chunk:
+                return None
+            self.candidates = [(ref, start) for ref in self.references for start in _sample_offsets(ref.pcm, chunk)]
+        offset = self.received
+        self.received += len(chunk)
+        self.candidates = [
+            (ref, start) for ref, start in self.candidates
+            if ref.pcm[start + offset:start + offset + len(chunk)] == chunk
+        ]
+        text = self._text()
+        if text != self.partial:
+            self.partial = text
+            return text
+        return None
+
+    def _text(self):
+        if self.candidates is None or len(self.candidates) != 1:
+            return ''
+        ref, start = self.candidates[0]
+        span = max(1, ref.speech_end - ref.speech_start)
+
+        def spoken(position):
+            return int(len(ref.words) * min(1.0, max(0.0, (position - ref.speech_start) / span)))
+
+        skipped = round(len(ref.words) * min(1.0, max(0.0, (start - ref.speech_start) / span)))
+        return ' '.join(ref.words[skipped:spoken(start + self.received)])
+
+    def finish(self):
+        return self._text()
+
+
+class StubRecognizer:
+    """Deterministic recognizer for tests: known audio maps to a fixed transcript
+
+    Reference WAVs are indexed by a hash of their PCM frames, with the
+    transcript taken from the file name. Streaming a file's frames back
+    yields exactly its transcript; anything else is heard as silence.
+    Incremental sessions (start_stream) also produce partial transcripts
+    as a file's speech arrives, including audio that starts part way into
+    a file.
+    """
+
+    def __init__(self, transcripts=None, references=None):
+        self.transcripts = dict(transcripts or {})
+        self.references = list(references or [])
+
+    @classmethod
+    def from_directory(cls, directory):
+        transcripts = {}
+        references = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.wav'):
+                    continue
+                with wave.open(os.path.join(directory, name), 'rb') as wf:
+                    pcm = wf.readframes(wf.getnframes())
+                    params = wf.getparams()
+                transcript = transcript_from_filename(name)
+                transcripts[pcm_digest(pcm)] = transcript
+
+                # Where the speech sits in the file, for pacing partial transcripts
+                start, end = 0, len(pcm)
+                if params.sampwidth == 2:
+                    vad = EnergyVAD(params.framerate, params.sampwidth, params.nchannels)
+                    vad.feed(pcm)
+                    if vad.speech_started:
+                        start, end = vad.speech_start_byte, vad.speech_end_byte
+                references.append(_StubReference(pcm, transcript, start, end))
+        log.info("Stub recognizer indexed reference audio", extra={
+            'directory': directory, 'files': len(transcripts)
+        })
+        return cls(transcripts, references)
+
+    def transcribe(self, stream):
+        return self.transcripts.get(pcm_digest(stream.pcm()), '')
+
+    def start_stream(self, stream, mid_stream=False):
+        return _StubRecognition(self.references, stream, mid_stream)
+
+
+class SphinxRecognizer:
+    """Offline CMU Sphinx recognition through the SpeechRecognition package
+
+    PocketSphinx is an optional extra, not in requirements.txt.
+    """
+
+    def __init__(self):
+        try:
+            import speech_recognition as sr
+            import pocketsphinx  # recognize_sphinx imports it lazily; fail at startup instead
+        except ImportError as e:
+            raise ImportError(f"The sphinx recognizer needs SpeechRecognition and PocketSphinx "
+                              f"(pip install pocketsphinx): {e}") from e
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, stream):
+        audio = self._sr.AudioData(stream.pcm(), stream.sample_rate, stream.sample_width)
+        try:
+            return self.recognizer.recognize_sphinx(audio)
+        except self._sr.UnknownValueError:
+            return ''
+
+
+RECOGNIZER_BACKENDS = {
+    'stub': StubRecognizer.from_directory,
+    'sphinx': SphinxRecognizer
+}
+
+
+def load_recognizer(backend='stub', **kwargs):
+    """Build the named speech recognizer backend"""
+    if backend not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer backend {backend!r}; choose from {sorted(RECOGNIZER_BACKENDS)}")
+    return RECOGNIZER_BACKENDS[backend](**kwargs)
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from build_info import git_revision
+
+HISTORY_FILE = 'startup_history.jsonl'
+
+
+def run_profile(backend):
+    """Profile one cold start in a fresh interpreter"""
+    completed = subprocess.run(
+        [sys.executable, 'startup_profile.py', '--backend', backend],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout)
+
+
+def summarize(reports):
+    """Median seconds/RSS per phase across repeated cold starts"""
+    phases = {}
+    for report in reports:
+        for p in report['phases']:
+            entry = phases.setdefault(p['phase'], {'seconds': [], 'rss_delta_mb': [], 'new_packages': set()})
+            entry['seconds'].append(p['seconds'])
+            if p['rss_delta_mb'] is not None:
+                entry['rss_delta_mb'].append(p['rss_delta_mb'])
+            entry['new_packages'].update(p['new_packages'])
+
+    return {
+        name: {
+            'seconds': statistics.median(e['seconds']),
+            'rss_delta_mb': statistics.median(e['rss_delta_mb']) if e['rss_delta_mb'] else None,
+            'new_packages': sorted(e['new_packages'])
+        }
+        for name, e in phases.items()
+    }
+
+
+def load_history(path, backend):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [e for e in entries if e.get('backend') == backend]
+
+
+def find_regressions(current, history, window, time_threshold, min_seconds, rss_threshold_mb):
+    """Compare each phase with the median of the last `window` runs"""
+    recent = history[-window:]
+    if not recent:
+        return []
+
+    regressions = []
+    for name, phase in current.items():
+        past = [h['phases'][name] for h in recent if name in h['phases']]
+        if not past:
+            continue
+
+        baseline_seconds = statistics.median(p['seconds'] for p in past)
+        slower = phase['seconds'] - baseline_seconds
+        if slower > min_seconds and phase['seconds'] > baseline_seconds * (1 + time_threshold):
+            regressions.append(f"{name}: {phase['seconds']:.3f}s vs baseline {baseline_seconds:.3f}s")
+
+        past_rss = [p['rss_delta_mb'] for p in past if p['rss_delta_mb'] is not None]
+        if phase['rss_delta_mb'] is not None and past_rss:
+            baseline_rss = statistics.median(past_rss)
+            if phase['rss_delta_mb'] - baseline_rss > rss_threshold_mb:
+                regressions.append(f"{name}: +{phase['rss_delta_mb']:.0f} MB vs baseline +{baseline_rss:.0f} MB")
+
+        # New heavy imports show up as packages no recent run needed
+        known = set().union(*(p['new_packages'] for p in past))
+        added = sorted(set(phase['new_packages']) - known)
+        if added:
+            regressions.append(f"{name}: new packages imported: {', '.join(added)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track cold-start time and memory across builds")
+    parser.add_argument('--backend', default='pipeline')
+    parser.add_argument('--runs', type=int, default=3, help="Cold starts to take the median of")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    parser.add_argument('--window', type=int, default=5, help="Past runs that form the baseline")
+    parser.add_argument('--time-threshold', type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    parser.add_argument('--rss-threshold-mb', type=float, default=25)
+    parser.add_argument('--no-record', action='store_true', help="Compare without appending to history")
+    args = parser.parse_args()
+
+    print(f"Profiling {args.runs} cold start(s) of the {args.backend} backend...")
+    reports = [run_profile(args.backend) for _ in range(args.runs)]
+    current = summarize(reports)
+
+    history = load_history(args.history, args.backend)
+    regressions = find_regressions(current, history, args.window, args.time_threshold,
+                                   args.min_seconds, args.rss_threshold_mb)
+
+    print("\n===== STARTUP BREAKDOWN (median) =====")
+    for name, phase in current.items():
+        rss = f"{phase['rss_delta_mb']:+.0f} MB" if phase['rss_delta_mb'] is not None else ''
+        print(f"{name:<20} {phase['seconds']:>8.3f}s {rss:>9}")
+    peaks = [r['peak_rss_mb'] for r in reports if r['peak_rss_mb'] is not None]
+    peak = statistics.median(peaks) if peaks else None
+    print(f"{'total':<20} {statistics.median(r['total_seconds'] for r in reports):>8.3f}s"
+          + (f" peak {peak:.0f} MB" if peak is not None else ""))
+
+    if not args.no_record:
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'backend': args.backend,
+            'runs': args.runs,
+            'total_seconds': statistics.median(r['total_seconds'] for r in reports),
+            'peak_rss_mb': peak,
+            'phases': current
+        }
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        print(f"\nAppended to {args.history}")
+
+    if not history:
+        print("No history yet - this run becomes the baseline")
+        return 0
+    if regressions:
+        print("\n❌ Startup regressions:")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+    print("\n✅ No startup regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
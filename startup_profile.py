@@ -0,0 +1,131 @@
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from resource_usage import current_rss_mb, peak_rss_mb
+
+# Keep this module's own imports light: everything heavy is imported inside
+# a phase so it is charged to that phase.
+
+
+def _top_level_modules():
+    return {name.split('.')[0] for name in sys.modules}
+
+
+class StartupProfiler:
+    """Records wall time, RSS and newly imported packages for each phase"""
+
+    def __init__(self):
+        self.phases = []
+        self.started = time.perf_counter()
+        self.baseline_rss_mb = current_rss_mb()
+
+    @contextmanager
+    def phase(self, name):
+        modules_before = _top_level_modules()
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        rss_after = current_rss_mb()
+        self.phases.append({
+            'phase': name,
+            'seconds': elapsed,
+            'rss_mb': rss_after,
+            'rss_delta_mb': (rss_after - rss_before) if rss_after is not None and rss_before is not None else None,
+            'modules_loaded': len(sys.modules),
+            'new_packages': sorted(_top_level_modules() - modules_before)
+        })
+
+    def report(self, **info):
+        return dict(info, **{
+            'python': sys.version.split()[0],
+            'total_seconds': time.perf_counter() - self.started,
+            'baseline_rss_mb': self.baseline_rss_mb,
+            'final_rss_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+            'phases': self.phases
+        })
+
+
+def profile_startup(backend='pipeline'):
+    """Walk through the same steps as a cold server start, one phase each"""
+    profiler = StartupProfiler()
+
+    with profiler.phase('import_flask'):
+        import flask
+        import flask_socketio
+
+    with profiler.phase('import_torch'):
+        import torch
+
+    with profiler.phase('import_transformers'):
+        import transformers
+
+    with profiler.phase('import_app'):
+        import app
+
+    from inference import CLASSIFIER_BACKENDS, EMBEDDING_MODEL, ZERO_SHOT_MODEL
+    if backend not in CLASSIFIER_BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}")
+    labels = app.COMMAND_CONFIG['identity']['labels']
+
+    if backend == 'embedding':
+        with profiler.phase('tokenizer_load'):
+            tokenizer = transformers.AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+        with profiler.phase('weights_load'):
+            model = transformers.AutoModel.from_pretrained(EMBEDDING_MODEL)
+        with profiler.phase('label_encoding'):
+            classifier = CLASSIFIER_BACKENDS['embedding'](
+                EMBEDDING_MODEL, labels=labels, tokenizer=tokenizer, model=model
+            )
+    else:
+        with profiler.phase('tokenizer_load'):
+            tokenizer = transformers.AutoTokenizer.from_pretrained(ZERO_SHOT_MODEL)
+        with profiler.phase('weights_load'):
+            model = transformers.AutoModelForSequenceClassification.from_pretrained(ZERO_SHOT_MODEL)
+        if backend == 'quantized':
+            with profiler.phase('quantize'):
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        with profiler.phase('pipeline_build'):
+            classifier = transformers.pipeline(
+                "zero-shot-classification", model=model, tokenizer=tokenizer, device=-1
+            )
+
+    with profiler.phase('first_inference'):
+        classifier("who am i", labels)
+
+    with profiler.phase('second_inference'):
+        classifier("who am i", labels)
+
+    return profiler.report(backend=backend, torch=torch.__version__, transformers=transformers.__version__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down cold start time and memory by phase")
+    parser.add_argument('--backend', default='pipeline')
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = profile_startup(args.backend)
+
+    # Human-readable summary on stderr, machine-readable report on stdout
+    print(f"{'Phase':<20} {'Seconds':>8} {'RSS (MB)':>9} {'+RSS':>7}  New packages", file=sys.stderr)
+    for p in report['phases']:
+        delta = f"{p['rss_delta_mb']:.0f}" if p['rss_delta_mb'] is not None else '?'
+        rss = f"{p['rss_mb']:.0f}" if p['rss_mb'] is not None else '?'
+        packages = ', '.join(p['new_packages'][:6]) + (' ...' if len(p['new_packages']) > 6 else '')
+        print(f"{p['phase']:<20} {p['seconds']:>8.3f} {rss:>9} {delta:>7}  {packages}", file=sys.stderr)
+    peak = f" peak {report['peak_rss_mb']:.0f} MB" if report['peak_rss_mb'] is not None else ''
+    print(f"{'total':<20} {report['total_seconds']:>8.3f}{peak}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
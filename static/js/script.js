@@ -20,6 +20,12 @@ let voicesLoaded = false;
 // Cache computed styles for performance
 let currentFontSize = parseFloat(getComputedStyle(document.body).fontSize);
 
+// Telemetry - timings are buffered and sent in batches, not one message per action
+const TELEMETRY_BATCH_SIZE = 20;
+const TELEMETRY_FLUSH_MS = 10000;
+const pendingRequests = new Map(); // request_id -> timings so far
+let telemetryBuffer = [];
+
 // Speech recognition optimizations
 recognition.continuous = false;
 recognition.interimResults = false;
@@ -73,13 +79,16 @@ function startListening() {
 }
 
 recognition.onresult = (event) => {
+    const recognizedAt = performance.now();
     const transcript = event.results[0][0].transcript.toLowerCase().trim();
     logDebug(`🎧 Heard: ${transcript}`);
     updateFeedback(`Processing: ${transcript}`);
     
-    // Send the command to the server
-    console.log('Sending command to server:', transcript);
-    socket.emit('process_command', { text: transcript });
+    // Send the command to the server with an id so replies can be correlated
+    const requestId = newRequestId();
+    console.log('Sending command to server:', transcript, requestId);
+    socket.emit('process_command', { text: transcript, request_id: requestId });
+    pendingRequests.set(requestId, { t_recognized: recognizedAt, t_sent: performance.now() });
 };
 
 recognition.onerror = (event) => {
@@ -96,6 +105,7 @@ socket.on('connect', () => {
 });
 
 socket.on('action_update', (response) => {
+    const receivedAt = performance.now();
     console.log('Action update received:', response);
     logDebug('📡 Server response:', response);
     
@@ -109,18 +119,28 @@ socket.on('action_update', (response) => {
     
     // Execute action immediately
     executeAction(response);
+    recordTiming(response.request_id, response.action, receivedAt);
     
     // Speak feedback after UI updates
     setTimeout(() => speakFeedback(response.feedback), 50);
 });
 
 socket.on('error', (error) => {
+    const receivedAt = performance.now();
     logDebug(`⚠️ Server error: ${error.message}`);
     updateFeedback(error.message);
+    recordTiming(error.request_id, 'error', receivedAt);
+});
+
+socket.on('busy', (data) => {
+    pendingRequests.delete(data.request_id);
+    logDebug(`⏳ Server busy: ${data.message}`);
+    updateFeedback(data.message);
+    resetMic();
 });
 
 socket.on('app_ready', (data) => {
-    logDebug('App ready signal received');
+    logDebug('App ready signal received, model status:', data.model_status);
     updateFeedback('Ready for voice commands');
 });
 
@@ -177,9 +197,6 @@ function executeAction(response) {
         default:
             console.warn('Unknown action:', response.action);
     }
-    
-    // Log action to server
-    socket.emit('client_log', { message: `Action executed: ${response.action} - ${response.direction || ''}` });
 }
 
 // SIMPLIFIED DIRECT FUNCTIONS FOR UI CHANGES
@@ -305,6 +322,46 @@ function resetMic() {
     isProcessing = false;
 }
 
+// Complete the timing record for a reply and queue it for the server
+function recordTiming(requestId, action, receivedAt) {
+    const timing = pendingRequests.get(requestId);
+    if (!timing) return; // e.g. replies triggered from the test page
+    pendingRequests.delete(requestId);
+
+    telemetryBuffer.push({
+        ...timing,
+        action: action,
+        request_id: requestId,
+        t_received: receivedAt,
+        t_applied: performance.now()
+    });
+    if (telemetryBuffer.length >= TELEMETRY_BATCH_SIZE) {
+        flushTelemetry();
+    }
+}
+
+function flushTelemetry() {
+    // Forget requests that never got a reply
+    const cutoff = performance.now() - 60000;
+    for (const [requestId, timing] of pendingRequests) {
+        if (timing.t_sent < cutoff) pendingRequests.delete(requestId);
+    }
+
+    if (telemetryBuffer.length === 0 || !socket.connected) return;
+    socket.emit('client_telemetry', { events: telemetryBuffer });
+    telemetryBuffer = [];
+}
+
+setInterval(flushTelemetry, TELEMETRY_FLUSH_MS);
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flushTelemetry();
+});
+
+// Unique id for each command sent to the server
+function newRequestId() {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
+}
+
 // Debug utilities
 function logDebug(...messages) {
     if(DEBUG_MODE) console.log('[DEBUG]', ...messages);
@@ -0,0 +1,85 @@
+import math
+import threading
+from latency_sketch import RollingLatencyAggregator
+
+# Client timestamps (performance.now(), ms) and the stage between each pair
+STAGES = (
+    ('recognition_to_emit', 't_recognized', 't_sent'),
+    ('emit_to_update', 't_sent', 't_received'),
+    ('update_to_dom', 't_received', 't_applied'),
+    ('end_to_end', 't_recognized', 't_applied'),
+)
+
+# Anything slower than this is a stuck tab or a clock jump, not a latency
+MAX_PLAUSIBLE_MS = 60000
+MAX_EVENTS_PER_BATCH = 500
+
+
+class TelemetryAggregator:
+    """Folds batched client timing events into rolling per-action percentiles
+
+    Raw events are never stored: each one is reduced to stage durations
+    and added to a latency sketch for its (action, stage) pair. Actions
+    outside `actions` are counted as 'other', so clients cannot grow the
+    number of sketches. Safe to call from concurrent handlers.
+    """
+
+    def __init__(self, window_seconds=900, bucket_seconds=60, actions=()):
+        self.latencies = RollingLatencyAggregator(window_seconds, bucket_seconds)
+        self.actions = frozenset(actions)
+        self.events = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def set_actions(self, actions):
+        self.actions = frozenset(actions)
+
+    def ingest(self, events):
+        """Add a batch of client events; returns how many were accepted"""
+        if not isinstance(events, list):
+            with self._lock:
+                self.rejected += 1
+            return 0
+        batch = events[:MAX_EVENTS_PER_BATCH]
+        accepted = sum(1 for event in batch if self._ingest_event(event))
+        with self._lock:
+            self.events += accepted
+            self.rejected += len(batch) - accepted
+        return accepted
+
+    def _ingest_event(self, event):
+        if not isinstance(event, dict):
+            return False
+        action = event.get('action')
+        if not isinstance(action, str) or action not in self.actions:
+            action = 'other'
+
+        durations = []
+        for stage, start_key, end_key in STAGES:
+            start, end = event.get(start_key), event.get(end_key)
+            if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+                continue
+            elapsed = end - start
+            if not math.isfinite(elapsed) or elapsed < 0 or elapsed > MAX_PLAUSIBLE_MS:
+                return False
+            durations.append((stage, elapsed / 1000.0))
+
+        if not durations:
+            return False
+        for stage, seconds in durations:
+            self.latencies.add((action, stage), seconds)
+        return True
+
+    def snapshot(self):
+        """Percentiles (seconds) per action and stage for the current window"""
+        result = {}
+        for (action, stage), summary in self.latencies.snapshot().items():
+            result.setdefault(action, {})[stage] = summary
+        with self._lock:
+            events, rejected = self.events, self.rejected
+        return {
+            'window_seconds': self.latencies.window_seconds,
+            'events': events,
+            'rejected': rejected,
+            'actions': result
+        }
@@ -4,68 +4,119 @@ import json
 import csv
 import os
 import threading
+import uuid
 import socketio
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from latency_sketch import LatencyBreakdown
+
+class PendingTest:
+    """A command that has been sent and is waiting for its reply"""
+    
+    def __init__(self, command, expected_action, expected_direction):
+        self.command = command
+        self.expected = {
+            'action': expected_action,
+            'direction': expected_direction
+        }
+        self.request_id = uuid.uuid4().hex
+        self.start_time = time.perf_counter()
+        self.completed = threading.Event()
+        self.result = None
 
 class VoiceAssistantTester:
-    """Framework for testing voice assistant accuracy and latency"""
+    """Framework for testing voice assistant accuracy and latency
+    
+    Every command carries a request id that the server echoes back, so
+    replies are matched to the command that caused them even when many
+    tests are in flight at once.
+    """
     
-    def __init__(self, base_url="http://localhost:5000"):
+    def __init__(self, base_url="http://localhost:5000", keep_results=True, store=None):
         self.base_url = base_url
         self.socket = socketio.Client()
+        # Raw results are only needed for CSV export and charts; the
+        # analysis comes from streaming sketches
+        self.keep_results = keep_results
         self.results = []
-        self.current_test_start_time = None
-        self.current_test_command = None
-        self.test_completed = threading.Event()
+        self.stats = LatencyBreakdown()
+        # Optional results_store.ResultsWriter that keeps every result across runs
+        self.store = store
+        self._pending = {}
+        self._unsolicited = None
+        self._lock = threading.Lock()
         
         # Set up socket event handlers
         self.socket.on('connect', self.on_connect)
         self.socket.on('action_update', self.on_action_update)
         self.socket.on('error', self.on_error)
+        self.socket.on('busy', self.on_busy)
         
     def on_connect(self):
         print("Connected to server")
     
-    def on_action_update(self, data):
-        latency = time.time() - self.current_test_start_time
-        
-        # Record the result
+    def _claim(self, data):
+        """Find (and remove) the pending test a reply belongs to"""
+        with self._lock:
+            pending = self._pending.pop(data.get('request_id'), None)
+            if pending is None and self._unsolicited is not None:
+                # Reply to a command we did not send ourselves (e.g. from a browser tab)
+                pending, self._unsolicited = self._unsolicited, None
+            return pending
+    
+    def _complete(self, pending, actual_action, actual_direction, success, error_message=None):
+        latency = time.perf_counter() - pending.start_time
         result = {
-            'command': self.current_test_command,
-            'expected_action': self.current_test_expected['action'],
-            'expected_direction': self.current_test_expected['direction'],
-            'actual_action': data.get('action'),
-            'actual_direction': data.get('direction'),
+            'command': pending.command,
+            'expected_action': pending.expected['action'],
+            'expected_direction': pending.expected['direction'],
+            'actual_action': actual_action,
+            'actual_direction': actual_direction,
             'latency': latency,
-            'success': (data.get('action') == self.current_test_expected['action'] and
-                        data.get('direction') == self.current_test_expected['direction']),
+            'success': success,
             'timestamp': datetime.now().isoformat()
         }
+        if error_message is not None:
+            result['error_message'] = error_message
+        
+        self.stats.add(pending.expected['action'], latency, success)
+        if self.store is not None:
+            self.store.append(result)
+        if self.keep_results:
+            with self._lock:
+                self.results.append(result)
+        pending.result = result
+        pending.completed.set()
+        return result
+    
+    def on_action_update(self, data):
+        pending = self._claim(data)
+        if pending is None:
+            return
         
-        self.results.append(result)
-        print(f"Test completed: {result['success']}, Latency: {latency:.3f}s")
-        self.test_completed.set()
+        success = (data.get('action') == pending.expected['action'] and
+                   data.get('direction') == pending.expected['direction'])
+        result = self._complete(pending, data.get('action'), data.get('direction'), success)
+        print(f"Test completed: {pending.command!r} {result['success']}, Latency: {result['latency']:.3f}s")
     
     def on_error(self, data):
-        latency = time.time() - self.current_test_start_time
+        pending = self._claim(data)
+        if pending is None:
+            return
         
-        # Record error result
-        result = {
-            'command': self.current_test_command,
-            'expected_action': self.current_test_expected['action'],
-            'expected_direction': self.current_test_expected['direction'],
-            'actual_action': 'error',
-            'actual_direction': None,
-            'latency': latency,
-            'success': False,
-            'error_message': data.get('message', 'Unknown error'),
-            'timestamp': datetime.now().isoformat()
-        }
+        # An error reply is the right answer for negative test cases
+        message = data.get('message', 'Unknown error')
+        result = self._complete(pending, 'error', None, pending.expected['action'] == 'error', message)
+        print(f"Test error: {pending.command!r} {message}, Latency: {result['latency']:.3f}s")
+    
+    def on_busy(self, data):
+        pending = self._claim(data)
+        if pending is None:
+            return
         
-        self.results.append(result)
-        print(f"Test error: {data.get('message', 'Unknown error')}, Latency: {latency:.3f}s")
-        self.test_completed.set()
+        # Record rejected command
+        result = self._complete(pending, 'busy', None, False, data.get('message', 'Server busy'))
+        print(f"Test rejected (server busy): {pending.command!r}, Latency: {result['latency']:.3f}s")
     
     def connect(self):
         """Connect to the socket server"""
@@ -81,39 +132,55 @@ class VoiceAssistantTester:
         if self.socket.connected:
             self.socket.disconnect()
     
+    def expect_response(self, command, expected_action, expected_direction):
+        """Wait for the next reply to a command sent by someone else
+        
+        Used when the command does not come from this tester (for example
+        audio played into a browser tab); only one such expectation can be
+        outstanding at a time.
+        """
+        pending = PendingTest(command, expected_action, expected_direction)
+        with self._lock:
+            self._unsolicited = pending
+        return pending
+    
+    def wait_for(self, pending, timeout=10):
+        """Wait for a pending test, recording a timeout if no reply arrives"""
+        if pending.completed.wait(timeout):
+            return True
+        
+        # Whichever side removes the pending test records its result
+        with self._lock:
+            claimed = self._pending.pop(pending.request_id, None) is pending
+            if self._unsolicited is pending:
+                self._unsolicited = None
+                claimed = True
+        
+        if not claimed:
+            # A reply claimed it first and is recording the result now
+            pending.completed.wait()
+            return True
+        
+        self._complete(pending, 'timeout', None, False, 'Request timed out')
+        print(f"Test timeout for command: {pending.command}")
+        return False
+    
+    def register(self, command, expected_action, expected_direction):
+        """Start tracking a command that will be sent with pending.request_id"""
+        pending = PendingTest(command, expected_action, expected_direction)
+        with self._lock:
+            self._pending[pending.request_id] = pending
+        return pending
+    
     def test_command(self, command, expected_action, expected_direction, timeout=10):
         """Test a single voice command"""
-        self.test_completed.clear()
-        self.current_test_command = command
-        self.current_test_expected = {
-            'action': expected_action,
-            'direction': expected_direction
-        }
-        self.current_test_start_time = time.time()
-        
-        # Emit the command
-        self.socket.emit('process_command', {'text': command})
-        
-        # Wait for response with timeout
-        success = self.test_completed.wait(timeout)
-        
-        if not success:
-            # Timeout occurred
-            result = {
-                'command': command,
-                'expected_action': expected_action,
-                'expected_direction': expected_direction,
-                'actual_action': 'timeout',
-                'actual_direction': None,
-                'latency': timeout,
-                'success': False,
-                'error_message': 'Request timed out',
-                'timestamp': datetime.now().isoformat()
-            }
-            self.results.append(result)
-            print(f"Test timeout for command: {command}")
+        pending = self.register(command, expected_action, expected_direction)
         
-        return success
+        # Emit the command with its correlation id
+        pending.start_time = time.perf_counter()
+        self.socket.emit('process_command', {'text': command, 'request_id': pending.request_id})
+        
+        return self.wait_for(pending, timeout)
     
     def run_test_suite(self, test_cases, parallel=False, max_workers=4):
         """Run a suite of tests"""
@@ -121,15 +188,22 @@ class VoiceAssistantTester:
             if not self.connect():
                 return False
         
-        self.results = []
+        # Results and statistics accumulate across suites; return only this suite's
+        first = len(self.results)
         
         if parallel:
+            # Each test waits on its own request id, so concurrent replies
+            # cannot be credited to the wrong command
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                for test_case in test_cases:
-                    executor.submit(self.test_command, 
-                                   test_case['command'], 
-                                   test_case['action'], 
-                                   test_case['direction'])
+                futures = [
+                    executor.submit(self.test_command,
+                                    test_case['command'],
+                                    test_case['action'],
+                                    test_case['direction'])
+                    for test_case in test_cases
+                ]
+                for future in futures:
+                    future.result()
         else:
             for test_case in test_cases:
                 self.test_command(
@@ -140,7 +214,13 @@ class VoiceAssistantTester:
                 # Add a small delay between tests
                 time.sleep(0.5)
         
-        return self.results
+        return self.results[first:]
+    
+    def reset(self):
+        """Forget all results and statistics"""
+        with self._lock:
+            self.results = []
+            self.stats = LatencyBreakdown()
     
     def export_results(self, filename='test_results.csv'):
         """Export test results to CSV"""
@@ -159,59 +239,42 @@ class VoiceAssistantTester:
     
     def analyze_results(self):
         """Analyze test results"""
-        if not self.results:
-            return {
-                'total_tests': 0,
-                'success_rate': 0,
-                'average_latency': 0,
-                'min_latency': 0,
-                'max_latency': 0
-            }
+        summary = self.stats.summary()
+        latency = summary['latency']
         
-        total = len(self.results)
-        successful = sum(1 for r in self.results if r['success'])
-        success_rate = (successful / total) * 100
-        
-        latencies = [r['latency'] for r in self.results]
-        avg_latency = sum(latencies) / len(latencies)
-        min_latency = min(latencies)
-        max_latency = max(latencies)
-        
-        # Group by command type
-        by_action = {}
-        for r in self.results:
-            action = r['expected_action']
-            if action not in by_action:
-                by_action[action] = {
-                    'total': 0,
-                    'success': 0,
-                    'latency': []
-                }
-            
-            by_action[action]['total'] += 1
-            by_action[action]['success'] += 1 if r['success'] else 0
-            by_action[action]['latency'].append(r['latency'])
-        
-        # Calculate per-action metrics
-        action_metrics = {}
-        for action, data in by_action.items():
-            action_metrics[action] = {
-                'success_rate': (data['success'] / data['total']) * 100,
-                'avg_latency': sum(data['latency']) / len(data['latency'])
-            }
+        def seconds(value):
+            return value if value is not None else 0
         
         analysis = {
-            'total_tests': total,
-            'successful_tests': successful,
-            'success_rate': success_rate,
-            'average_latency': avg_latency,
-            'min_latency': min_latency,
-            'max_latency': max_latency,
-            'action_metrics': action_metrics
+            'total_tests': summary['total'],
+            'successful_tests': summary['successful'],
+            'success_rate': summary['success_rate'],
+            'average_latency': seconds(latency['mean']),
+            'min_latency': seconds(latency['min']),
+            'max_latency': seconds(latency['max']),
+            'latency_percentiles': {
+                key: value for key, value in latency.items() if key.startswith('p')
+            },
+            'action_metrics': {
+                action: {
+                    'total': group['total'],
+                    'success_rate': group['success_rate'],
+                    'avg_latency': group['latency']['mean'],
+                    'latency_percentiles': {
+                        key: value for key, value in group['latency'].items() if key.startswith('p')
+                    }
+                }
+                for action, group in summary['groups'].items()
+            }
         }
         
         return analysis
     
+    def save_snapshot(self, filename):
+        """Write the latency sketches so several runs can be merged later"""
+        with open(filename, 'w') as f:
+            json.dump(self.stats.to_dict(), f)
+    
     def print_analysis(self):
         """Print analysis to console"""
         analysis = self.analyze_results()
@@ -222,11 +285,18 @@ class VoiceAssistantTester:
         print(f"Average Latency: {analysis['average_latency']:.3f}s")
         print(f"Min Latency: {analysis['min_latency']:.3f}s")
         print(f"Max Latency: {analysis['max_latency']:.3f}s")
+        if analysis['total_tests']:
+            print("Percentiles: " + ", ".join(
+                f"{key} {value:.3f}s" for key, value in analysis['latency_percentiles'].items()
+            ))
         
         print("\n=== Results by Action Type ===")
         for action, metrics in analysis['action_metrics'].items():
             print(f"Action: {action}")
             print(f"  Success Rate: {metrics['success_rate']:.2f}%")
             print(f"  Avg Latency: {metrics['avg_latency']:.3f}s")
+            print(f"  p50/p90/p99/p99.9: " + "/".join(
+                f"{value:.3f}" for value in metrics['latency_percentiles'].values()
+            ) + "s")
 
         return analysis
@@ -0,0 +1,136 @@
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from resource_usage import cpu_count
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def drive_load(model, transcripts, labels, clients, requests_per_client):
+    """Closed-loop load: each client thread sends its next request on reply"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        own = []
+        for i in range(requests_per_client):
+            transcript = transcripts[(offset + i) % len(transcripts)]
+            start = time.perf_counter()
+            model(transcript, labels)
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+
+def run_setting(backend, intra_op, inter_op, concurrency, client_levels,
+                requests_per_client, batch_size, conn):
+    """Benchmark one thread setting in a fresh process (torch threads are per-process)"""
+    from inference import BatchingClassifier, configure_torch_threads, load_classifier
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+    import app
+
+    configure_torch_threads(intra_op, inter_op)
+    labels = app.COMMAND_CONFIG['identity']['labels']
+    transcripts = [tc['command'] for tc in TEST_CASES + NEGATIVE_TEST_CASES]
+
+    model = BatchingClassifier(
+        load_classifier(backend),
+        max_batch_size=batch_size,
+        max_concurrent=concurrency
+    )
+    model("warm up", labels)
+
+    results = []
+    for clients in client_levels:
+        result = drive_load(model, transcripts, labels, clients, requests_per_client)
+        result.update({'intra_op': intra_op, 'inter_op': inter_op, 'concurrency': concurrency})
+        results.append(result)
+    conn.send(results)
+    conn.close()
+
+
+def sweep(backend, thread_options, concurrency_options, client_levels,
+          requests_per_client, batch_size, inter_op=1):
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for intra_op in thread_options:
+        for concurrency in concurrency_options:
+            print(f"Benchmarking intra-op={intra_op}, concurrent inferences={concurrency}...")
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=run_setting, args=(
+                backend, intra_op, inter_op, concurrency, client_levels,
+                requests_per_client, batch_size, child_conn
+            ))
+            process.start()
+            results.extend(parent_conn.recv())
+            process.join()
+    return results
+
+
+def main():
+    cores = cpu_count()
+    default_threads = sorted({1, max(1, cores // 2), cores})
+    default_concurrency = sorted({1, 2, max(1, cores // 4)})
+
+    parser = argparse.ArgumentParser(description="Sweep torch thread settings against concurrency")
+    parser.add_argument('--backend', default='pipeline')
+    parser.add_argument('--intra-op', type=int, nargs='+', default=default_threads)
+    parser.add_argument('--inter-op', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=default_concurrency,
+                        help="Concurrent inferences allowed (scheduler threads)")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                        help="Simultaneous callers to drive the model with")
+    parser.add_argument('--requests', type=int, default=20, help="Requests per client")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Max batch size (1 disables batching to isolate threading)")
+    parser.add_argument('--output', default='thread_benchmark_results.json')
+    args = parser.parse_args()
+
+    print(f"Detected {cores} cores")
+    results = sweep(args.backend, args.intra_op, args.concurrency, args.clients,
+                    args.requests, args.batch_size, args.inter_op)
+
+    print("\n===== THREAD BUDGET SWEEP =====")
+    print(f"{'Intra':>6} {'Conc':>5} {'Clients':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'req/s':>8}")
+    for r in results:
+        print(f"{r['intra_op']:>6} {r['concurrency']:>5} {r['clients']:>8} "
+              f"{r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['throughput']:>8.2f}")
+
+    # Best setting per load level, judged on tail latency
+    print("\n=== Lowest p99 per client level ===")
+    for clients in args.clients:
+        best = min((r for r in results if r['clients'] == clients), key=lambda r: r['p99_ms'])
+        print(f"  {clients} clients: TORCH_INTRA_OP_THREADS={best['intra_op']} "
+              f"INFERENCE_CONCURRENCY={best['concurrency']} (p99 {best['p99_ms']:.1f}ms)")
+
+    with open(args.output, 'w') as f:
+        json.dump({'cores': cores, 'results': results}, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import glob
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import secrets
+import time
+from logging_setup import DroppingQueueHandler
+
+CAPTURE_LOGGER = 'care_assistant.capture'
+
+
+class _CaptureFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.capture, separators=(',', ':'))
+
+
+class TrafficCapture:
+    """Opt-in log of real commands for later replay
+
+    Each command becomes one compact JSON line: arrival time (`t`),
+    anonymized session (`s`), transcript (`x`), route (`r`), outcome
+    (`a`) and server time in ms (`ms`). Session ids are replaced by an
+    HMAC, so sessions stay distinguishable without being identifiable.
+    Writes go through a background queue to a size-rotated file.
+    """
+
+    def __init__(self, path, secret=None, max_bytes=10 * 1024 * 1024, backup_count=5, max_queue_size=10000):
+        self.path = path
+        # A per-process random key means ids cannot be linked across restarts
+        self._key = (secret or secrets.token_hex(32)).encode('utf-8')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        output = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        output.setFormatter(_CaptureFormatter())
+
+        self._handler = DroppingQueueHandler(queue.Queue(maxsize=max_queue_size))
+        self._listener = logging.handlers.QueueListener(self._handler.queue, output)
+        self._listener.start()
+
+        self._logger = logging.getLogger(CAPTURE_LOGGER)
+        self._logger.handlers = [self._handler]
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+
+    def anonymize(self, sid):
+        return hmac.new(self._key, str(sid).encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+    def record(self, sid, transcript, route, outcome, started, total_seconds):
+        """Log one handled command; `started` is its perf_counter() arrival time"""
+        arrival = time.time() - (time.perf_counter() - started)
+        self._logger.info('capture', extra={'capture': {
+            't': round(arrival, 4),
+            's': self.anonymize(sid),
+            'x': transcript,
+            'r': route,
+            'a': outcome,
+            'ms': round(total_seconds * 1000, 3)
+        }})
+
+    @property
+    def dropped(self):
+        return self._handler.dropped
+
+    def close(self):
+        self._listener.stop()
+
+
+def read_capture(path):
+    """All records from a capture log and its rotated backups, by arrival time"""
+    records = []
+    for name in glob.glob(glob.escape(path) + '*'):
+        suffix = name[len(path):]
+        if suffix and not suffix.lstrip('.').isdigit():
+            continue
+        with open(name) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda r: r['t'])
+    return records
@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+
+# Bump when rendering or mixing changes, so cached files are regenerated
+GENERATOR_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+CLEAN_DIR = '.clean'
+NOISE_KINDS = ('white', 'pink')
+
+
+def cache_key(**params):
+    """Content address for an output: hash of the text and every render parameter"""
+    params['version'] = GENERATOR_VERSION
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+# ===== Worker side (runs in the process pool) =====
+
+_engine = None
+_default_voice = None
+
+
+def _tts_engine():
+    """One pyttsx3 engine per worker process, created on first use"""
+    global _engine, _default_voice
+    if _engine is None:
+        import pyttsx3
+        _engine = pyttsx3.init()
+        _default_voice = _engine.getProperty('voice')
+    return _engine
+
+
+def render_clean(text, rate, voice, path):
+    """Synthesize `text` to a WAV at `path`"""
+    engine = _tts_engine()
+    engine.setProperty('rate', rate)
+    engine.setProperty('voice', voice or _default_voice)
+    # Write under a temporary name so an interrupted run never leaves a
+    # truncated file that later runs would treat as cached
+    tmp = f"{path}.{os.getpid()}.tmp.wav"
+    engine.save_to_file(text, tmp)
+    engine.runAndWait()
+    os.replace(tmp, path)
+    return path
+
+
+def make_noise(kind, n, rng):
+    white = rng.standard_normal(n).astype(np.float32)
+    if kind == 'white':
+        return white
+    # Pink: shape the white spectrum by 1/sqrt(f)
+    spectrum = np.fft.rfft(white)
+    freqs = np.arange(len(spectrum), dtype=np.float32)
+    freqs[0] = 1.0
+    return np.fft.irfft(spectrum / np.sqrt(freqs), n).astype(np.float32)
+
+
+def mix_noise(samples, snr_db, kind, seed):
+    """Add noise to int16 samples at the given speech-to-noise ratio
+
+    `seed` is anything np.random.default_rng accepts, such as a list of ints.
+    """
+    signal = samples.astype(np.float32)
+    noise = make_noise(kind, len(signal), np.random.default_rng(seed))
+
+    # Measure speech level on the active part only, so leading and
+    # trailing silence does not make the noise too quiet
+    peak = np.abs(signal).max() if len(signal) else 0.0
+    active = signal[np.abs(signal) > 0.05 * peak] if peak else signal
+    speech_rms = np.sqrt(np.mean(active ** 2)) if len(active) else 0.0
+    noise_rms = np.sqrt(np.mean(noise ** 2)) or 1.0
+
+    noise *= speech_rms / (noise_rms * 10 ** (snr_db / 20))
+    return np.clip(signal + noise, -32768, 32767).astype(np.int16)
+
+
+def render_variant(clean_path, path, snr_db, noise, seed, key):
+    """Write a noisy copy of a clean render"""
+    with wave.open(clean_path, 'rb') as wf:
+        params = wf.getparams()
+        if params.sampwidth != 2:
+            raise ValueError(f"{clean_path}: expected 16-bit PCM, got {params.sampwidth * 8}-bit")
+        samples = np.frombuffer(wf.readframes(params.nframes), dtype=np.int16)
+
+    # Mixing in the content key gives every file its own reproducible noise
+    mixed = mix_noise(samples, snr_db, noise, [seed, int(key[:8], 16)])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with wave.open(tmp, 'wb') as out:
+        out.setparams(params)
+        out.writeframes(mixed.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+# ===== Planning (runs in the parent) =====
+
+def plan_corpus(test_cases, rates, voices, snrs, noises, seeds, wake_word=None):
+    """Every (command, rate, voice, noise) combination as a manifest entry
+
+    With `wake_word`, each command is spoken after it ("hello dark mode").
+    """
+    items = []
+    for test_case, rate, voice in itertools.product(test_cases, rates, voices):
+        text = f"{wake_word} {test_case['command']}" if wake_word else test_case['command']
+        clean_key = cache_key(text=text, rate=rate, voice=voice)
+        variants = [(None, None, None)]
+        variants += [(snr, noise, seed) for snr in snrs for noise in noises for seed in range(seeds)]
+        for snr_db, noise, seed in variants:
+            key = cache_key(text=text, rate=rate, voice=voice,
+                            snr_db=snr_db, noise=noise, seed=seed)
+            items.append({
+                # Same naming as simulated_commands/, so the transcript can
+                # be recovered from the file name alone
+                'file': f"command_{key[:16]}_{slug(text)}.wav",
+                'command': test_case['command'],
+                'text': text,
+                'wake_word': wake_word,
+                'action': test_case['action'],
+                'direction': test_case['direction'],
+                'rate': rate,
+                'voice': voice,
+                'snr_db': snr_db,
+                'noise': noise,
+                'seed': seed,
+                'key': key,
+                'clean_key': clean_key
+            })
+    return items
+
+
+def wav_duration(path):
+    with wave.open(path, 'rb') as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+def generate_corpus(items, output_dir, workers=None):
+    """Render whatever is missing and return counts of rendered/cached files"""
+    clean_dir = os.path.join(output_dir, CLEAN_DIR)
+    os.makedirs(clean_dir, exist_ok=True)
+
+    def clean_path(item):
+        return os.path.join(clean_dir, f"{item['clean_key']}.wav")
+
+    # One clean render per (text, rate, voice), shared by all its noise variants
+    clean_jobs = {}
+    for item in items:
+        path = clean_path(item)
+        if not os.path.exists(path):
+            clean_jobs[path] = (item['text'], item['rate'], item['voice'], path)
+
+    variant_jobs = []
+    copies = []
+    for item in items:
+        path = os.path.join(output_dir, item['file'])
+        if os.path.exists(path):
+            continue
+        if item['noise'] is None:
+            copies.append((clean_path(item), path))
+        else:
+            variant_jobs.append((clean_path(item), path, item['snr_db'], item['noise'], item['seed'],
+                                 item['key']))
+
+    # Spawned workers: TTS engines do not survive a fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        if clean_jobs:
+            print(f"Rendering {len(clean_jobs)} utterances...")
+            list(pool.map(render_clean, *zip(*clean_jobs.values())))
+        if variant_jobs:
+            print(f"Mixing {len(variant_jobs)} noisy variants...")
+            list(pool.map(render_variant, *zip(*variant_jobs), chunksize=8))
+
+    for source, path in copies:
+        shutil.copyfile(source, path)
+
+    return {
+        'rendered': len(clean_jobs),
+        'mixed': len(variant_jobs),
+        'cached': len(items) - len(variant_jobs) - len(copies)
+    }
+
+
+def write_manifest(items, output_dir):
+    for item in items:
+        item['duration'] = wav_duration(os.path.join(output_dir, item['file']))
+    manifest = {
+        'generator_version': GENERATOR_VERSION,
+        'created': datetime.now().isoformat(),
+        'items': items
+    }
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def load_manifest(directory):
+    """Manifest items for a generated corpus, or None for a plain WAV directory"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['items']
+
+
+def prune(items, output_dir):
+    """Delete WAVs no longer in the plan"""
+    keep = {item['file'] for item in items}
+    keep_clean = {f"{item['clean_key']}.wav" for item in items}
+    removed = 0
+    for name in os.listdir(output_dir):
+        if name.endswith('.wav') and name not in keep:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+    clean_dir = os.path.join(output_dir, CLEAN_DIR)
+    for name in os.listdir(clean_dir):
+        if name.endswith('.wav') and name not in keep_clean:
+            os.remove(os.path.join(clean_dir, name))
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a test corpus of spoken commands with variants")
+    parser.add_argument('--output', default='tts_corpus')
+    parser.add_argument('--rates', type=int, nargs='+', default=[120, 150, 180], help="Words per minute")
+    parser.add_argument('--voices', nargs='+', default=[None],
+                        help="pyttsx3 voice ids (default: the engine's default voice)")
+    parser.add_argument('--snr-db', type=float, nargs='*', default=[20, 10, 5],
+                        help="Speech-to-noise ratios for noisy variants (a clean copy is always made)")
+    parser.add_argument('--noise', nargs='+', choices=NOISE_KINDS, default=list(NOISE_KINDS))
+    parser.add_argument('--seeds', type=int, default=1, help="Different noise draws per setting")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--wake-word', help="Say this before every command, e.g. 'hello'")
+    parser.add_argument('--prune', action='store_true', help="Delete files not in the current plan")
+    args = parser.parse_args()
+
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+
+    items = plan_corpus(TEST_CASES + NEGATIVE_TEST_CASES, args.rates, args.voices,
+                        args.snr_db, args.noise, args.seeds, args.wake_word)
+    print(f"Corpus plan: {len(items)} utterances in {args.output}/")
+
+    counts = generate_corpus(items, args.output, args.workers)
+    if args.prune:
+        counts['pruned'] = prune(items, args.output)
+    path = write_manifest(items, args.output)
+
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+    print(f"Manifest written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import collections
+import functools
+import os
+import tempfile
+import wave
+import numpy as np
+from speech import frame_dbfs
+
+WAKE_WORD = 'hello'
+
+FRAME_MS = 25
+HOP_MS = 10
+MEL_BANDS = 20
+# Speech band only: keeps features comparable across sample rates
+MIN_HZ, MAX_HZ = 100, 4000
+
+
+@functools.lru_cache(maxsize=8)
+def mel_filterbank(sample_rate, n_fft, bands=MEL_BANDS):
+    """Triangular mel filters as a (bands, n_fft // 2 + 1) matrix"""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    top = min(MAX_HZ, sample_rate / 2)
+    edges = to_hz(np.linspace(to_mel(MIN_HZ), to_mel(top), bands + 2))
+    bins = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+
+class FeatureStream:
+    """Log-mel frames from a stream of 16-bit mono PCM, behind an energy gate
+
+    Frames are 25 ms every 10 ms. Only frames louder than `gate_db` get a
+    spectrum; quieter ones become a zero vector, so silence costs one RMS
+    per frame. Each voiced frame is mean-removed and scaled to unit
+    length, which makes the features independent of input gain.
+    """
+
+    def __init__(self, sample_rate, gate_db=-45.0):
+        self.sample_rate = int(sample_rate)
+        self.win = int(self.sample_rate * FRAME_MS / 1000)
+        self.hop = int(self.sample_rate * HOP_MS / 1000)
+        self.n_fft = 1 << (self.win - 1).bit_length()
+        self.window = np.hanning(self.win).astype(np.float32)
+        self.filterbank = mel_filterbank(self.sample_rate, self.n_fft)
+        self.gate_db = gate_db
+        self._tail = np.zeros(0, dtype=np.int16)
+        self.frames = 0
+        self.voiced_frames = 0
+
+    def feed(self, samples):
+        """Add int16 samples; returns (features, voiced) for the frames completed"""
+        samples = np.concatenate([self._tail, samples])
+        count = (len(samples) - self.win) // self.hop + 1 if len(samples) >= self.win else 0
+        self._tail = samples[count * self.hop:]
+        features = np.zeros((count, MEL_BANDS), dtype=np.float32)
+        if not count:
+            return features, np.zeros(0, dtype=bool)
+
+        # Gate on the newest hop of each frame
+        newest = samples[self.win - self.hop:self.win - self.hop + count * self.hop]
+        voiced = frame_dbfs(newest, self.hop) > self.gate_db
+        self.frames += count
+        self.voiced_frames += int(voiced.sum())
+        if voiced.any():
+            starts = np.flatnonzero(voiced) * self.hop
+            frames = samples[starts[:, None] + np.arange(self.win)].astype(np.float32)
+            power = np.abs(np.fft.rfft(frames * self.window, self.n_fft)) ** 2
+            logmel = np.log(power @ self.filterbank.T + 1e-6)
+            logmel -= logmel.mean(axis=1, keepdims=True)
+            logmel /= np.linalg.norm(logmel, axis=1, keepdims=True) + 1e-6
+            features[voiced] = logmel
+        return features, voiced
+
+
+def read_pcm(path):
+    """(int16 mono samples, sample rate) from a 16-bit WAV"""
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: wake word audio must be 16-bit PCM")
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype='<i2')
+        if wf.getnchannels() > 1:
+            samples = samples.reshape(-1, wf.getnchannels())[:, 0].copy()
+        return samples, wf.getframerate()
+
+
+def template_from_wav(path, gate_db=-45.0):
+    """Features of a recording of the wake word alone, trimmed to its voiced span"""
+    samples, rate = read_pcm(path)
+    features, voiced = FeatureStream(rate, gate_db).feed(samples)
+    indices = np.flatnonzero(voiced)
+    if not len(indices):
+        raise ValueError(f"{path}: no speech above {gate_db} dBFS")
+    return features[indices[0]:indices[-1] + 1]
+
+
+def save_templates(templates, path):
+    np.savez_compressed(path, *templates)
+
+
+def load_templates(path):
+    """Templates from an .npz written by `enroll`, or from a directory of WAVs"""
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.endswith('.wav'))
+        return [template_from_wav(os.path.join(path, name)) for name in names]
+    with np.load(path) as data:
+        return [data[name] for name in sorted(data.files, key=lambda n: int(n.split('_')[1]))]
+
+
+def dtw_distance(template, window):
+    """Mean frame distance of the best alignment of `template` ending at the last window frame
+
+    The alignment may start anywhere in the window and lets the spoken
+    word run between half and twice the template's length. Every path
+    costs exactly one weighted step per template frame, so the total
+    divided by the template length is comparable between templates.
+    """
+    cost = 1.0 - template @ window.T
+    rows, cols = cost.shape
+    before = np.full(cols, np.inf, dtype=np.float32)
+    previous = cost[0].copy()
+    for i in range(1, rows):
+        current = np.full(cols, np.inf, dtype=np.float32)
+        current[1:] = previous[:-1]
+        current[2:] = np.minimum(current[2:], previous[:-2])
+        current += cost[i]
+        # Skipping a template frame counts its cost twice
+        current[1:] = np.minimum(current[1:], before[:-1] + 2 * cost[i, 1:])
+        before, previous = previous, current
+    return float(previous[-1]) / rows
+
+
+class WakeWordSpotter:
+    """Listens for the wake word in a stream of 16-bit mono PCM
+
+    feed() returns None until the wake word has been heard, then the audio
+    that followed it (possibly empty); from then on every chunk is passed
+    straight through. Matching only runs while there is recent speech, and
+    then only every `match_every` frames, so idle listening costs little
+    more than the energy gate. A match is confirmed once it has not
+    improved for `settle_ms`, which is what the detection waits for after
+    the word ends.
+    """
+
+    def __init__(self, templates, sample_rate, threshold=0.15, gate_db=-45.0, match_every=3, settle_ms=150):
+        if not templates:
+            raise ValueError("WakeWordSpotter needs at least one template")
+        self.templates = templates
+        self.threshold = threshold
+        self.match_every = match_every
+        self.settle_frames = max(1, int(settle_ms / HOP_MS))
+        self.features = FeatureStream(sample_rate, gate_db)
+
+        longest = max(len(t) for t in templates)
+        self.shortest = min(len(t) for t in templates)
+        self._window = collections.deque(maxlen=2 * longest)
+        self._voiced = collections.deque(maxlen=2 * longest)
+        # Recent raw audio, for handing over what followed the wake word
+        self._recent = b''
+        self._keep_bytes = (2 * longest + self.settle_frames + match_every) * self.features.hop * 2 \
+            + self.features.win * 2
+        self._samples = 0
+        self._until_match = 0
+        self._candidate = None  # (distance, frame count) of the best match so far
+        self.best_distance = np.inf
+        self.awake = False
+        self.matches = 0
+
+    def feed(self, pcm):
+        if self.awake:
+            return pcm
+        self._recent += pcm
+        self._samples += len(pcm) // 2
+        features, voiced = self.features.feed(np.frombuffer(pcm, dtype='<i2'))
+
+        first = self.features.frames - len(features)
+        for index, (feature, loud) in enumerate(zip(features, voiced.tolist())):
+            self._window.append(feature)
+            self._voiced.append(loud)
+            if self._step(first + index + 1):
+                self.awake = True
+                return self._handover()
+        self._recent = self._recent[-self._keep_bytes:]
+        return None
+
+    def _step(self, frames):
+        """Advance to the given frame count; True once a match has been confirmed"""
+        self._until_match -= 1
+        if self._until_match > 0:
+            return False
+        self._until_match = self.match_every
+
+        # Nothing to match until enough speech has been heard recently
+        voiced = list(self._voiced)
+        if sum(voiced) < self.shortest // 2 or not any(voiced[-self.shortest:]):
+            return self._confirm(None, frames)
+
+        window = np.asarray(self._window)
+        self.matches += 1
+        distance = min(dtw_distance(t, window) for t in self.templates)
+        self.best_distance = min(self.best_distance, distance)
+        return self._confirm(distance, frames)
+
+    def _confirm(self, distance, frames):
+        # Keep following the match while it improves, so the wake word is
+        # cut after its last sound rather than at the first good-enough frame
+        if distance is not None and distance < self.threshold:
+            if self._candidate is None or distance <= self._candidate[0]:
+                self._candidate = (distance, frames)
+                return False
+        return self._candidate is not None and frames - self._candidate[1] >= self.settle_frames
+
+    def _handover(self):
+        """The audio after the end of the best-matching frame"""
+        _, frames = self._candidate
+        end = (frames - 1) * self.features.hop + self.features.win
+        return self._recent[max(0, len(self._recent) - (self._samples - end) * 2):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll wake word templates")
+    parser.add_argument('wavs', nargs='*', help="Recordings of the wake word alone")
+    parser.add_argument('--output', default='wake_word.npz')
+    parser.add_argument('--tts', action='store_true',
+                        help=f"Also render {WAKE_WORD!r} with the TTS engine at each --rates")
+    parser.add_argument('--rates', type=int, nargs='+', default=[120, 150, 180], help="Words per minute")
+    args = parser.parse_args()
+
+    paths = list(args.wavs)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.tts:
+            from tts_corpus import render_clean
+            for rate in args.rates:
+                paths.append(render_clean(WAKE_WORD, rate, None, os.path.join(tmp, f"{rate}.wav")))
+        if not paths:
+            parser.error("give wake word recordings or --tts")
+        templates = [template_from_wav(path) for path in paths]
+
+    save_templates(templates, args.output)
+    lengths = ", ".join(str(len(t) * HOP_MS) for t in templates)
+    print(f"Saved {len(templates)} templates ({lengths} ms) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from command_matcher import tokenize
+from speech import transcript_from_filename
+from tts_corpus import load_manifest
+from wake_word import WAKE_WORD, WakeWordSpotter, load_templates, read_pcm
+
+# Audio after each file, as a live microphone would keep sending
+TRAILING_SECONDS = 0.5
+SWEEP_THRESHOLDS = (0.05, 0.075, 0.1, 0.125, 0.15, 0.175, 0.2, 0.25, 0.3)
+
+
+def labelled_files(directories, wake_word):
+    """(path, transcript, contains the wake word) for every WAV in the directories"""
+    for directory in directories:
+        manifest = load_manifest(directory)
+        if manifest is not None:
+            entries = [(item['file'], item.get('text', item['command'])) for item in manifest]
+        else:
+            entries = [(name, transcript_from_filename(name))
+                       for name in sorted(os.listdir(directory)) if name.endswith('.wav')]
+        for name, transcript in entries:
+            yield os.path.join(directory, name), transcript, wake_word in tokenize(transcript)
+
+
+def spot(templates, samples, rate, threshold, chunk_ms, gate_db=-45.0):
+    """Stream samples through a spotter; returns hit time, best distance and CPU used"""
+    spotter = WakeWordSpotter(templates, rate, threshold=threshold, gate_db=gate_db)
+    samples = np.concatenate([samples, np.zeros(int(rate * TRAILING_SECONDS), dtype=np.int16)])
+    step = max(1, int(rate * chunk_ms / 1000))
+    hit_seconds = None
+
+    cpu_start = time.process_time()
+    for start in range(0, len(samples), step):
+        chunk = samples[start:start + step].tobytes()
+        if spotter.feed(chunk) is not None:
+            hit_seconds = (start + step) / rate
+            break
+    cpu = time.process_time() - cpu_start
+
+    return {
+        'hit_seconds': hit_seconds,
+        'best_distance': float(spotter.best_distance),
+        'cpu_seconds': cpu,
+        'audio_seconds': (start + step if hit_seconds else len(samples)) / rate,
+        'voiced_fraction': spotter.features.voiced_frames / max(1, spotter.features.frames),
+        'matches': spotter.matches
+    }
+
+
+def idle_cost(templates, seconds, rate=16000, chunk_ms=100, noise_dbfs=-60.0, seed=0):
+    """CPU per audio second while listening to a quiet room"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 32768 * 10 ** (noise_dbfs / 20), int(rate * seconds))
+    result = spot(templates, noise.astype(np.int16), rate, 0.0, chunk_ms)
+    return result['cpu_seconds'] / result['audio_seconds']
+
+
+def run_benchmark(templates, directories, wake_word=WAKE_WORD, threshold=0.15, chunk_ms=100, idle_seconds=60):
+    files = []
+    for path, transcript, positive in labelled_files(directories, wake_word):
+        samples, rate = read_pcm(path)
+        gated = spot(templates, samples, rate, threshold, chunk_ms)
+        # The same file with the energy gate disabled, to show what it saves
+        ungated = spot(templates, samples, rate, threshold, chunk_ms, gate_db=-np.inf)
+        files.append(dict(gated, file=os.path.basename(path), transcript=transcript, positive=positive,
+                          hit=gated['hit_seconds'] is not None, ungated_cpu_seconds=ungated['cpu_seconds'],
+                          ungated_audio_seconds=ungated['audio_seconds']))
+
+    positives = [f for f in files if f['positive']]
+    negatives = [f for f in files if not f['positive']]
+    audio = sum(f['audio_seconds'] for f in files)
+    detection_delays = [f['hit_seconds'] for f in positives if f['hit']]
+    return {
+        'templates': len(templates),
+        'threshold': threshold,
+        'chunk_ms': chunk_ms,
+        'files': len(files),
+        'positives': len(positives),
+        'negatives': len(negatives),
+        'detected': sum(f['hit'] for f in positives),
+        'false_accepts': sum(f['hit'] for f in negatives),
+        'cpu_ms_per_audio_second': sum(f['cpu_seconds'] for f in files) / max(audio, 1e-9) * 1000,
+        'ungated_cpu_ms_per_audio_second': sum(f['ungated_cpu_seconds'] for f in files)
+        / max(sum(f['ungated_audio_seconds'] for f in files), 1e-9) * 1000,
+        'idle_cpu_ms_per_audio_second': idle_cost(templates, idle_seconds, chunk_ms=chunk_ms) * 1000
+        if idle_seconds else None,
+        'voiced_fraction': float(np.mean([f['voiced_fraction'] for f in files])) if files else 0.0,
+        'median_hit_seconds': float(np.median(detection_delays)) if detection_delays else None,
+        # Whether each file would have triggered at other thresholds
+        'sweep': [
+            {
+                'threshold': t,
+                'detection_rate': sum(f['best_distance'] < t for f in positives) / len(positives)
+                if positives else None,
+                'false_accept_rate': sum(f['best_distance'] < t for f in negatives) / len(negatives)
+                if negatives else None
+            }
+            for t in SWEEP_THRESHOLDS
+        ],
+        'results': files
+    }
+
+
+def print_report(report):
+    print("\n===== WAKE WORD BENCHMARK =====")
+    print(f"Files: {report['files']} ({report['positives']} with the wake word, "
+          f"{report['negatives']} without), {report['templates']} templates, "
+          f"threshold {report['threshold']}")
+    if report['positives']:
+        print(f"Detected: {report['detected']} of {report['positives']}"
+              + (f", median {report['median_hit_seconds']:.2f}s into the file"
+                 if report['median_hit_seconds'] is not None else ""))
+    print(f"False accepts: {report['false_accepts']} of {report['negatives']}")
+
+    print(f"\nCPU per second of audio:")
+    print(f"  speech files, gated:   {report['cpu_ms_per_audio_second']:.2f} ms "
+          f"({report['voiced_fraction'] * 100:.0f}% of frames passed the energy gate)")
+    print(f"  speech files, ungated: {report['ungated_cpu_ms_per_audio_second']:.2f} ms")
+    if report['idle_cpu_ms_per_audio_second'] is not None:
+        print(f"  quiet room:            {report['idle_cpu_ms_per_audio_second']:.2f} ms")
+
+    print(f"\n{'Threshold':>10} {'Detected':>9} {'False acc.':>11}")
+    for row in report['sweep']:
+        detected = '-' if row['detection_rate'] is None else f"{row['detection_rate'] * 100:.0f}%"
+        false_accepts = '-' if row['false_accept_rate'] is None else f"{row['false_accept_rate'] * 100:.0f}%"
+        print(f"{row['threshold']:>10} {detected:>9} {false_accepts:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wake word spotter CPU cost and detection accuracy")
+    parser.add_argument('--templates', required=True, help="Templates from wake_word.py, or a directory of WAVs")
+    parser.add_argument('--audio-dir', nargs='+', default=['simulated_commands'],
+                        help="WAV directories; files whose transcript contains the wake word are positives")
+    parser.add_argument('--wake-word', default=WAKE_WORD)
+    parser.add_argument('--threshold', type=float, default=0.15)
+    parser.add_argument('--chunk-ms', type=float, default=100)
+    parser.add_argument('--idle-seconds', type=float, default=60, help="Length of the quiet-room run (0 skips it)")
+    parser.add_argument('--output', default='wake_word_benchmark_results.json')
+    args = parser.parse_args()
+
+    templates = load_templates(args.templates)
+    report = run_benchmark(templates, args.audio_dir, args.wake_word, args.threshold,
+                           args.chunk_ms, args.idle_seconds)
+    print_report(report)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
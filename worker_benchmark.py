@@ -0,0 +1,69 @@
+import functools
+import json
+import argparse
+from resource_usage import cpu_count, current_rss_mb
+from thread_benchmark import drive_load
+
+
+def main():
+    cores = cpu_count()
+
+    parser = argparse.ArgumentParser(description="Measure fallback throughput with 1..N model worker processes")
+    parser.add_argument('--backend', default='pipeline')
+    parser.add_argument('--max-workers', type=int, default=cores)
+    parser.add_argument('--clients-per-worker', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20, help="Requests per client")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--output', default='worker_benchmark_results.json')
+    args = parser.parse_args()
+
+    from inference import BatchingClassifier, load_classifier
+    from model_workers import ProcessClassifierPool
+    from run_tests import TEST_CASES, NEGATIVE_TEST_CASES
+    import app
+
+    labels = app.COMMAND_CONFIG['identity']['labels']
+    transcripts = [tc['command'] for tc in TEST_CASES + NEGATIVE_TEST_CASES]
+
+    # Every worker loads its own copy; loading here first fills the model cache
+    print(f"Loading {args.backend} backend...")
+    threshold = load_classifier(args.backend).threshold
+    print(f"Parent RSS after load: {current_rss_mb():.0f} MB")
+
+    results = []
+    for workers in range(1, args.max_workers + 1):
+        pool = ProcessClassifierPool(
+            functools.partial(load_classifier, args.backend),
+            threshold=threshold,
+            num_workers=workers,
+            intra_op_threads=max(1, cores // workers)
+        )
+        model = BatchingClassifier(pool, max_batch_size=args.batch_size, max_concurrent=workers)
+        try:
+            # Warm every worker before measuring
+            for _ in range(workers):
+                pool("warm up", labels)
+
+            clients = workers * args.clients_per_worker
+            print(f"Benchmarking {workers} worker(s) with {clients} clients...")
+            result = drive_load(model, transcripts, labels, clients, args.requests)
+            result['workers'] = workers
+            results.append(result)
+        finally:
+            pool.close()
+
+    base = results[0]['throughput'] if results and results[0]['throughput'] else None
+    print("\n===== MODEL WORKER SCALING =====")
+    print(f"{'Workers':>8} {'req/s':>8} {'Speedup':>8} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for r in results:
+        r['speedup'] = r['throughput'] / base if base else 0
+        print(f"{r['workers']:>8} {r['throughput']:>8.2f} {r['speedup']:>7.2f}x "
+              f"{r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'cores': cores, 'results': results}, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
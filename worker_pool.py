@@ -0,0 +1,90 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class CommandWorkerPool:
+    """Fixed-size thread pool with a bounded queue and admission control
+
+    `submit` never blocks: when the queue is full the job is rejected so the
+    caller can tell the client straight away instead of letting it time out.
+    """
+
+    def __init__(self, num_workers=4, max_queue_size=32, name='command-worker'):
+        self.num_workers = max(1, int(num_workers))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+
+        # Counters
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_workers = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        self._threads = []
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f'{name}-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args):
+        """Queue a job; returns False if the queue is full"""
+        try:
+            self._queue.put_nowait((func, args, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            func, args, enqueued_at = self._queue.get()
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._busy_workers += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            failed = True
+            try:
+                func(*args)
+                failed = False
+            except Exception:
+                log.exception("Worker job failed")
+            finally:
+                with self._lock:
+                    self._busy_workers -= 1
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+                self._queue.task_done()
+
+    def stats(self):
+        """Return queue depth, rejection and wait-time counters"""
+        with self._lock:
+            started = self._completed + self._failed + self._busy_workers
+            return {
+                'workers': self.num_workers,
+                'busy_workers': self._busy_workers,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_size': self.max_queue_size,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'failed': self._failed,
+                'total_wait_seconds': self._total_wait,
+                'max_wait_seconds': self._max_wait,
+                'mean_wait_seconds': self._total_wait / started if started else 0
+            }